@@ -1,5 +1,6 @@
 # standard libraries
 import doctest
+import importlib
 # third party libraries
 pass
 # first party libraries
@@ -7,4 +8,19 @@ import when
 
 
 doctest.testmod(when.when)
+doctest.testmod(importlib.import_module('when.timezones'))
 doctest.testmod(when._substitutions)
+doctest.testmod(importlib.import_module('when.parsing'))
+doctest.testmod(importlib.import_module('when.formatting'))
+doctest.testmod(importlib.import_module('when.arrays'))
+doctest.testmod(importlib.import_module('when.while_'))
+doctest.testmod(importlib.import_module('when.transitions'))
+doctest.testmod(importlib.import_module('when.binary'))
+doctest.testmod(importlib.import_module('when.storage'))
+doctest.testmod(importlib.import_module('when.calendars'))
+doctest.testmod(importlib.import_module('when.intervals'))
+doctest.testmod(importlib.import_module('when.during'))
+doctest.testmod(importlib.import_module('when.instrumentation'))
+doctest.testmod(importlib.import_module('when.clocks'))
+doctest.testmod(importlib.import_module('when.histograms'))
+doctest.testmod(importlib.import_module('when.scheduling'))
@@ -0,0 +1,399 @@
+# standard libraries
+import os
+import gc
+import re
+import sys
+import json
+import heapq
+import pickle
+import random
+import timeit
+import datetime
+import platform
+import argparse
+import tracemalloc
+import subprocess
+# third party libraries
+import pytz
+# first party libraries
+pass
+
+
+__where__ = os.path.dirname(os.path.abspath(__file__))
+__root__ = os.path.abspath(os.path.join(__where__, '..'))
+
+
+# what a fresh interpreter imports, by name; 'import pytz' and the eager
+# registry are baselines for the lazy one
+_imports = (
+    ('import when', 'import when'),
+    ('import pytz', 'import pytz'),
+    ('import pytz + every zone',
+     'import pytz; [pytz.timezone(name) for name in pytz.all_timezones]'),
+)
+
+
+def _median(values):
+    values = sorted(values)
+    middle = len(values)//2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle])/2.0
+
+
+class _LegacyWhen(object):
+    # the per-instance layout of When before it used __slots__
+    def __init__(self, year, month, day, timezone):
+        tz = pytz.timezone(timezone)
+        self._datetime = tz.localize(datetime.datetime(year, month, day))
+        self._utc = self._datetime.astimezone(pytz.utc)
+        self._timezone = timezone
+        self._format_substitutor = None
+
+
+def _operations():
+    """ The hot paths of ```when```, as (name, setup) or (name, setup, batch)
+        tuples; calling setup returns the zero-argument function to be
+        measured, which does ```batch``` (by default one) of the operation.
+
+        Operations marked "(before)" are the code paths they replaced, kept
+        as baselines.
+
+    """
+    import when
+    from when import (When, While, Timer, clocks, parsing, transitions,
+                      substitutions, formatting, )
+    from when.timezones import Timezones, CaseInsensitiveDict
+    from when.scheduling import TimingWheel
+    zone = 'America/New_York'
+    earth_day = When(2015, 4, 22, 5, timezone=zone)
+    later = earth_day + While(hours=1)
+    awhile = While(minutes=90)
+    pickled = pickle.dumps(earth_day, pickle.HIGHEST_PROTOCOL)
+    timer = Timer()
+    def views():
+        view = When._from_epoch(earth_day._epoch, zone)
+        def switch():
+            view.timezone = 'Europe/London'
+            view.timezone = zone
+        return switch
+    def fields():
+        # a fresh view each time, so the local datetime is built once per call
+        view = When._from_epoch(earth_day._epoch, zone)
+        return view.year, view.month, view.day, view.hour, view.minute
+    def tic_toc():
+        timer.tic()
+        return timer.toc()
+    def with_block():
+        with timer:
+            pass
+    def now_on(clock):
+        def now():
+            with clocks.using(clock):
+                return When.now(zone)
+        return lambda: now
+
+    # the timezone registry, before and after it became lazy
+    def eager_registry():
+        registry = CaseInsensitiveDict()
+        for name in pytz.all_timezones:
+            registry[name] = pytz.timezone(name)
+            registry[name].name = name
+        return registry
+    def lazy_registry():
+        registry = Timezones()
+        registry['America/New_York']
+        return registry
+
+    def iso_uncached():
+        # the specifiers tried in turn, each regex built afresh, as before
+        # plans were cached
+        parsing.compile.cache_clear()
+        return When._from_iso_format_generic('2015-03-03T02:00:59', timezone='utc')
+
+    def legacy_now():
+        # now as it was, utcnow localized into UTC, then a switch of view
+        now = When.from_datetime(datetime.datetime.utcnow(), 'utc')
+        now.timezone = zone
+        return now
+    def legacy_tic_toc():
+        # tic/toc as they were, two wall-clock Whens and their difference
+        started = When.now()
+        return When.now() - started
+    @timer
+    def decorated():
+        pass
+
+    days = 365
+    start = When(2015, 1, 1, timezone=zone)
+    stop = start + While(days=days)
+    def range_loop():
+        # the hand-written loop that When.range replaces
+        day, days = start, []
+        while day < stop:
+            days.append(day)
+            day = day + While(days=1)
+            day = When(day.year, day.month, day.day, day.hour,
+                       timezone=day._timezone, dst_if_ambiguous=False)
+        return days
+
+    deadlines = 1000
+    clock = clocks.ManualClock(When(2015, 4, 22, timezone='utc'))
+    first = clock.epoch()
+    shuffled = random.Random(0)
+    schedule = [When._from_epoch(first + shuffled.randint(1, 3600000000), 'utc')
+                for _ in range(deadlines)]
+    hour_later = When._from_epoch(first + 3600000000, 'utc')
+    def callback(when):
+        pass
+    def wheel():
+        clock.set(first)
+        wheel = TimingWheel(clock=clock)
+        handles = [wheel.schedule(when, callback) for when in schedule]
+        for handle in handles[::2]:
+            handle.cancel()
+        wheel.advance(hour_later)
+    def heap():
+        # a heap of Whens, cancelled lazily by marking entries
+        heap, cancelled = [], set()
+        for index, when in enumerate(schedule):
+            heapq.heappush(heap, (when, index))
+        cancelled.update(range(0, deadlines, 2))
+        while heap:
+            when, index = heapq.heappop(heap)
+            if index not in cancelled:
+                callback(when)
+
+    values = {key: 'x' for key in formatting._emitters}
+    ordered = sorted(values, key=lambda key: (len(key), key), reverse=True)
+    unit = 'Thursday, July 4th, 1776 1:02:03 pm -- '
+    template = (unit*(1024//len(unit) + 1))[:1024]
+    substitutor = substitutions.Substitutor(values)
+    def regex_substitutor():
+        # the substitutor as it was, compiled from a regex alternation
+        regex = re.compile('|'.join(re.escape(key) for key in ordered))
+        return lambda string: regex.sub(lambda match: values[match.group(0)], string)
+    regex = regex_substitutor()
+
+    specifier = '7/4/1776 1:02 pm'
+    rows = [format(When(2015, 1 + day % 12, 1 + day % 28, day % 24, day % 60,
+                        timezone='utc'), specifier) for day in range(1000)]
+    def known():
+        return list(When.parse_many(rows, specifier, timezone='utc'))
+    def inferred():
+        return list(When.parse_many(rows, timezone='utc'))
+    def try_each():
+        # trying candidate specifiers row by row, with an exception per miss
+        whens = []
+        for row in rows:
+            for candidate in parsing._candidates:
+                try:
+                    whens.append(When.from_string(row, candidate, timezone='utc'))
+                    break
+                except (ValueError, pytz.InvalidTimeError):
+                    continue
+        return whens
+
+    def rebuilt():
+        # every field read building the local datetime, as before it was
+        # cached (switching views did no work then either)
+        local = transitions.of(zone).local_datetime
+        epoch = earth_day._epoch
+        return (local(epoch).year, local(epoch).month, local(epoch).day,
+                local(epoch).hour, local(epoch).minute)
+    def cached():
+        view = When._from_epoch(earth_day._epoch, 'utc')
+        for timezone in ('Europe/London', 'utc', zone):
+            view.timezone = timezone
+        return view.year, view.month, view.day, view.hour, view.minute
+    def shared():
+        # a second view of an instant whose fields have been read already
+        view = earth_day.with_timezone(zone)
+        return view.year, view.month, view.day, view.hour, view.minute
+    earth_day.year
+
+    operations = [
+        ('When()', lambda: lambda: When(2015, 4, 22, 5, 6, 7, timezone=zone)),
+        ('When() with a __dict__ (before)',
+         lambda: lambda: _LegacyWhen(2015, 4, 22, zone)),
+        ('now()', lambda: lambda: when.now()),
+        ('now(timezone)', lambda: lambda: when.now(zone)),
+        ('utcnow + from_datetime (before)', lambda: legacy_now),
+        ('now() using SystemClock', now_on(clocks.SystemClock())),
+        ('now() using CoarseClock', now_on(clocks.CoarseClock())),
+        ('now() using ManualClock', now_on(clocks.ManualClock())),
+        ('SystemClock.epoch', lambda: clocks.SystemClock().epoch),
+        ('CoarseClock.epoch', lambda: clocks.CoarseClock().epoch),
+        ('eager registry, per zone (before)', lambda: eager_registry,
+         len(pytz.all_timezones)),
+        ('lazy registry, one lookup', lambda: lazy_registry),
+        ('from_string', lambda: lambda: When.from_string(
+            '2015-04-22 05:06:07', '1776-07-04 13:02:03', timezone=zone)),
+        ('from_iso_format', lambda: lambda: When.from_iso_format(
+            '2015-04-22T05:06:07.123456-04:00', timezone=zone)),
+        ('from_iso_format, local', lambda: lambda: When.from_iso_format(
+            '2015-03-03T02:00:59', timezone='utc')),
+        ('from_iso_format, uncached (before)', lambda: iso_uncached),
+        ('parse_many known, per row', lambda: known, len(rows)),
+        ('parse_many inferred, per row', lambda: inferred, len(rows)),
+        ('candidates per row (before)', lambda: try_each, len(rows)),
+        ('__format__', lambda: lambda: format(earth_day, 'Thursday, July 4th, 1776 1:02 pm')),
+        ('iso_format', lambda: lambda: earth_day.iso_format),
+        ('Substitutor, 1k chars', lambda: lambda: substitutor(template)),
+        ('Substitutor scan, 1k chars',
+         lambda: lambda: substitutions._scan(substitutor._split, template)),
+        ('regex sub, 1k chars (before)', lambda: lambda: regex(template)),
+        ('in_string, 1k chars',
+         lambda: lambda: substitutions.in_string(template, values)),
+        ('in_string regex, 1k chars (before)',
+         lambda: lambda: regex_substitutor()(template)),
+        ('timezone setter (x2)', views),
+        ('with_timezone', lambda: lambda: earth_day.with_timezone('Europe/London')),
+        ('fields (x5)', lambda: fields),
+        ('views x3 + fields x5', lambda: cached),
+        ('fields x5 rebuilt (before)', lambda: rebuilt),
+        ('with_timezone + fields x5', lambda: shared),
+        ('==', lambda: lambda: earth_day == later),
+        ('<', lambda: lambda: earth_day < later),
+        ('hash', lambda: lambda: hash(earth_day)),
+        ('When + While', lambda: lambda: earth_day + awhile),
+        ('When - While', lambda: lambda: earth_day - awhile),
+        ('When - When', lambda: lambda: later - earth_day),
+        ('range While step, per day',
+         lambda: lambda: list(When.range(start, stop, While(days=1))), days),
+        ('range calendar step, per day',
+         lambda: lambda: list(When.range(start, stop, 'day')), days),
+        ('range rebuild loop, per day (before)', lambda: range_loop, days),
+        ('pickle.dumps', lambda: lambda: pickle.dumps(earth_day, pickle.HIGHEST_PROTOCOL)),
+        ('pickle.loads', lambda: lambda: pickle.loads(pickled)),
+        ('Timer tic/toc', lambda: tic_toc),
+        ('Timer with block', lambda: with_block),
+        ('Timer-decorated call', lambda: decorated),
+        ('tic/toc on When.now (before)', lambda: legacy_tic_toc),
+        ('TimingWheel, per deadline', lambda: wheel, deadlines),
+        ('heapq of Whens, per deadline (before)', lambda: heap, deadlines),
+    ]
+    try:
+        from when.arrays import WhenArray
+    except ImportError:
+        pass
+    else:
+        operations.append(('WhenArray.range, per day',
+                           lambda: lambda: WhenArray.range(start, stop, 'day'), days))
+    return operations
+
+
+def _seconds_per_call(function, number, repeat):
+    return _median(timeit.repeat(function, number=number, repeat=repeat))/number
+
+
+def _bytes_per_call(function, number):
+    # bytes still allocated per call while the results are kept alive, ie the
+    # memory cost of what an operation returns and caches
+    function()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    results = [function() for _ in range(number)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return max(0.0, (after - before - sys.getsizeof(results))/float(number))
+
+
+def _measure_import(statement, repeat):
+    # a fresh interpreter for every run, so nothing is already imported; the
+    # size is measured separately since tracing allocations slows the import
+    timed = ('import time; t = time.perf_counter(); {}; '
+             'print(time.perf_counter() - t)').format(statement)
+    traced = ('import tracemalloc; tracemalloc.start(); {}; '
+              'print(tracemalloc.get_traced_memory()[0])').format(statement)
+    environment = dict(os.environ, PYTHONPATH=__root__)
+    def median_output(code):
+        return _median([float(subprocess.check_output([sys.executable, '-c', code],
+                                                      env=environment))
+                        for _ in range(repeat)])
+    return median_output(timed), median_output(traced)
+
+
+def run(number=2000, repeat=5, only=None):
+    """ Measure every operation, returning {name: {'seconds', 'bytes'}}.
+
+        Batched operations are called ```number``` // batch times, so each
+        takes about as long to measure as the others, and are reported per
+        element of the batch.
+
+    """
+    results = {}
+    for name, statement in _imports:
+        if only is None or name in only:
+            seconds, size = _measure_import(statement, repeat)
+            results[name] = {'seconds': seconds, 'bytes': size}
+    for operation in _operations():
+        name, setup, batch = (operation + (1, ))[:3]
+        if only is not None and name not in only:
+            continue
+        function = setup()
+        calls = max(1, number//batch)
+        results[name] = {
+            'seconds': _seconds_per_call(function, calls, repeat)/batch,
+            'bytes': _bytes_per_call(function, calls)/batch,
+        }
+    return results
+
+
+def report(results, baseline=None):
+    header = '{:38} {:>12} {:>10}'.format('operation', 'us/op', 'bytes/op')
+    if baseline is not None:
+        header += ' {:>12} {:>8}'.format('baseline us', 'ratio')
+    print(header)
+    for name, result in results.items():
+        line = '{:38} {:12.3f} {:10.1f}'.format(name, 1e6*result['seconds'],
+                                                result['bytes'])
+        previous = None if baseline is None else baseline.get(name)
+        if previous is not None:
+            ratio = result['seconds']/previous['seconds']
+            line += ' {:12.3f} {:7.2f}x'.format(1e6*previous['seconds'], ratio)
+        print(line)
+
+
+def save(results, path):
+    document = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'operations': results,
+    }
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path, 'r') as f:
+        return json.load(f)['operations']
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(
+        description='Time (and size) the hot paths of when, optionally '
+                    'against a saved baseline.'
+    )
+    parser.add_argument('--number', type=int, default=2000,
+                        help='calls (or batch elements) per timing run')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='timing runs, of which the median is reported')
+    parser.add_argument('--only', action='append',
+                        help='only measure this operation (repeatable)')
+    parser.add_argument('--save', metavar='PATH',
+                        help='save the results as a baseline JSON file')
+    parser.add_argument('--compare', metavar='PATH',
+                        help='compare against a baseline JSON file')
+    arguments = parser.parse_args(arguments)
+    sys.path.insert(0, __root__)
+    results = run(arguments.number, arguments.repeat, arguments.only)
+    baseline = None if arguments.compare is None else load(arguments.compare)
+    report(results, baseline)
+    if arguments.save is not None:
+        save(results, arguments.save)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,10 @@
 # standard libraries
 import os
+import importlib
 # third party libraries
 pass
 # first party libraries
-from . import (when, timezones, while_, during, substitutions, )
+from . import (when, timezones, substitutions, while_, clocks, )
 
 
 __where__ = os.path.dirname(os.path.abspath(__file__))
@@ -14,17 +15,51 @@ with open(os.path.join(__where__, '..', 'VERSION'), 'rb') as f:
 
 
 __all__ = ('__version__', '__where__', 'now', 'When', 'While', 'timezones',
-           'tic', 'toc', 'sleep', 'Timer', 'when', '_substitutions')
+           'WhenIndex', 'tic', 'toc', 'sleep', 'Timer', 'when', '_substitutions')
 
 When = when.When
 While = while_.While
 now = when.now
 timezones = timezones.timezones
-tic = during.tic
-toc = during.toc
-sleep = during.sleep
-Timer = during.Timer
 _substitutions = substitutions
 
 
+# submodules (and the names they provide) that are only imported on first use;
+# ``arrays`` also needs numpy, which is otherwise not required.  ``while_`` and
+# ``clocks`` are not among them, since ``When`` itself needs both
+_lazy_submodules = ('during', 'arrays', 'storage', 'intervals', 
+                    'instrumentation', 'histograms', 'scheduling', )
+_lazy_attributes = {
+    'WhenArray': ('arrays', 'WhenArray'),
+    'WhenIndex': ('intervals', 'WhenIndex'),
+    'tic': ('during', 'tic'),
+    'toc': ('during', 'toc'),
+    'sleep': ('during', 'sleep'),
+    'Timer': ('during', 'Timer'),
+}
+
+
+def __getattr__(name):
+    """ Import the optional submodules, and the names they provide, lazily.
+    
+        None of them is needed by ``When`` itself, so they are only loaded 
+        once one of their names is actually used.
+        
+    """
+    if name in _lazy_submodules:
+        return importlib.import_module('.' + name, __name__)
+    try:
+        module_name, attribute = _lazy_attributes[name]
+    except KeyError:
+        raise AttributeError('module {} has no attribute {}'.format(__name__, name))
+    module = importlib.import_module('.' + module_name, __name__)
+    value = getattr(module, attribute)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_submodules) | set(_lazy_attributes))
+
+
 __doc__ = When.__doc__
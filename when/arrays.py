@@ -0,0 +1,359 @@
+# standard libraries
+import datetime
+# third party libraries
+import numpy
+# first party libraries
+from .when import When
+from .while_ import While
+from .timezones import timezones
+from . import transitions, calendars
+
+
+__all__ = ('WhenArray', )
+
+
+def _microseconds(delta):
+    # While and timedelta durations as an integer number of microseconds
+    if isinstance(delta, While):
+        return delta._microseconds
+    elif isinstance(delta, datetime.timedelta):
+        return (delta.days*86400 + delta.seconds)*1000000 + delta.microseconds
+    else:
+        return None
+
+
+class WhenArray(object):
+    """ A column of instants stored as int64 microseconds since the epoch.
+
+        Each element behaves like a When, but the whole array shares a
+        single timezone view and operations run over the underlying NumPy
+        buffer instead of looping over Python objects.  The constructor
+        accepts epoch microseconds, NumPy datetime64 values (or anything
+        NumPy can turn into them) interpreted as UTC, and always copies
+        them, so that sorting the array never reorders the caller's values.
+
+        >>> new_years = [When(2015, 1, 1, timezone='America/New_York'),
+        ...              When(2014, 1, 1, timezone='America/New_York')]
+        >>> array = WhenArray.from_whens(new_years)
+        >>> array
+        WhenArray(['2015-01-01T05:00:00.000000', '2014-01-01T05:00:00.000000'], timezone='America/New_York')
+        >>> array[0]
+        When(2015, 1, 1, 0, 0, 0, 0, 'America/New_York', False)
+        >>> array.sort()
+        >>> print(array[0])
+        2014-01-01 00:00:00-05:00
+        >>> array > When(2014, 6, 1, timezone='utc')
+        array([False,  True])
+        >>> print((array + While(hours=1))[1])
+        2015-01-01 01:00:00-05:00
+        >>> epochs = numpy.array([2, 1])
+        >>> WhenArray(epochs).sort()
+        >>> epochs
+        array([2, 1])
+
+    """
+    def __init__(self, values, timezone='utc'):
+        if timezone not in timezones:
+            raise ValueError('You must supply a valid timezone.')
+        values = numpy.asarray(values)
+        if values.dtype.kind in 'iu':
+            epochs = values.astype(numpy.int64)
+        else:
+            epochs = values.astype('datetime64[us]').view(numpy.int64)
+        self._epochs = epochs
+        self._timezone = timezone
+
+    @classmethod
+    def _from_epochs(cls, epochs, timezone):
+        array = cls.__new__(cls)
+        array._epochs = epochs
+        array._timezone = timezone
+        return array
+
+    @classmethod
+    def from_whens(cls, whens, timezone=None):
+        """ Construct a WhenArray from an iterable of Whens.
+
+            The view is ```timezone``` if given, otherwise that of the first
+            When (or UTC for an empty iterable).
+
+            >>> WhenArray.from_whens([], timezone='America/Atlantis')
+            Traceback (most recent call last):
+              ...
+            ValueError: You must supply a valid timezone.
+
+        """
+        whens = list(whens)
+        if timezone is None:
+            timezone = whens[0]._timezone if whens else 'utc'
+        elif timezone not in timezones:
+            raise ValueError('You must supply a valid timezone.')
+        epochs = numpy.fromiter((when._epoch for when in whens),
+                                dtype=numpy.int64, count=len(whens))
+        return cls._from_epochs(epochs, timezone)
+
+    @classmethod
+    def range(cls, start, stop, step, dst_if_ambiguous=False):
+        """ The Whens that ```When.range``` would generate, as a WhenArray.
+            
+            Fixed steps are a single ```numpy.arange```.  Calendar steps shift
+            the local wall-clock time of ```start``` with NumPy's month and 
+            day arithmetic and resolve the results with one vectorized pass 
+            over the timezone's transitions.
+            
+            >>> start = When(2015, 1, 31, timezone='America/New_York')
+            >>> stop = When(2015, 6, 1, timezone='America/New_York')
+            >>> [when.day for when in WhenArray.range(start, stop, 'month')]
+            [31, 28, 31, 30, 31]
+            >>> [when.hour for when in WhenArray.range(start, stop, 'month')]
+            [0, 0, 0, 0, 0]
+            >>> len(WhenArray.range(start, stop, While(hours=1)))
+            2903
+            
+        """
+        if stop is None:
+            raise ValueError('An array range needs a stop.')
+        timezone = start._timezone
+        first, stop = start._epoch, stop._epoch
+        microseconds = _microseconds(step)
+        if microseconds is not None:
+            if microseconds == 0:
+                raise ValueError('A step must not be zero.')
+            epochs = numpy.arange(first, stop, microseconds, dtype=numpy.int64)
+            return cls._from_epochs(epochs, timezone)
+        unit, count = calendars.parse_step(step)
+        zone = transitions.of(timezone)
+        anchor = zone.to_local(first)
+        # guess the length from the shortest step, then keep going in doubling
+        # chunks in case daylight saving time made some steps shorter
+        shortest = abs(count)*(calendars._day if unit == 'day' else 28*calendars._day)
+        size = abs(stop - first)//shortest + 2
+        chunks = []
+        steps = 0
+        while True:
+            counts = numpy.arange(steps, steps + size, dtype=numpy.int64)*count
+            local = calendars.shift_many(anchor, unit, counts)
+            epochs = zone.to_utc_many(local, dst_if_ambiguous)
+            if steps == 0:
+                epochs[0] = first
+            past = numpy.flatnonzero(epochs >= stop if count > 0 else epochs <= stop)
+            if len(past) > 0:
+                chunks.append(epochs[:past[0]])
+                break
+            chunks.append(epochs)
+            steps += size
+            size *= 2
+        return cls._from_epochs(numpy.concatenate(chunks), timezone)
+
+    def to_whens(self):
+        """ Return the instants as a list of Whens viewed in this timezone.
+
+        """
+        from_epoch = When._from_epoch
+        timezone = self._timezone
+        return [from_epoch(epoch, timezone) for epoch in self._epochs.tolist()]
+
+    tolist = to_whens
+
+    # underlying buffers
+
+    @property
+    def epochs(self):
+        """ The int64 microseconds since the epoch (a view, not a copy).
+
+        """
+        return self._epochs
+
+    @property
+    def datetime64(self):
+        """ The instants as a UTC datetime64[us] array (a view, not a copy).
+
+        """
+        return self._epochs.view('datetime64[us]')
+
+    @property
+    def local(self):
+        """ The local wall-clock times in this view, as a datetime64[us] array.
+        
+            The offsets for the whole array are found in one vectorized search
+            of the timezone's transitions.
+            
+            >>> array = WhenArray(['2015-01-01T12:00', '2015-07-01T12:00'], 
+            ...                   timezone='America/New_York')
+            >>> array.local
+            array(['2015-01-01T07:00:00.000000', '2015-07-01T08:00:00.000000'],
+                  dtype='datetime64[us]')
+
+        """
+        local = transitions.of(self._timezone).to_local_many(self._epochs)
+        return local.view('datetime64[us]')
+
+    # truncation
+
+    def _buckets(self, unit, timezone):
+        if timezone is None:
+            timezone = self._timezone
+        elif timezone not in timezones:
+            raise ValueError('You must supply a valid timezone.')
+        unit, count = calendars.parse_unit(unit)
+        zone = transitions.of(timezone)
+        epochs = self._epochs
+        local = zone.to_local_many(epochs)
+        if unit == 'fixed':
+            floors = epochs - local % count
+            return floors, floors + count, timezone
+        starts = calendars.floor_local_many(local, unit, count)
+        floors = zone.first_utc_many(starts)
+        ceilings = zone.first_utc_many(calendars.next_local_many(starts, unit, count))
+        return floors, ceilings, timezone
+
+    def floor(self, unit, timezone=None):
+        """ ```When.floor``` of every element, as bucket keys computed in one 
+            vectorized pass.
+            
+            Fixed units are integer arithmetic on the whole array; calendar 
+            units find every period start with NumPy's day and month 
+            arithmetic and a vectorized search of the transitions.
+            
+            >>> array = WhenArray(['2015-03-08T04:59', '2015-03-08T05:00', 
+            ...                    '2015-03-09T05:00'], timezone='America/New_York')
+            >>> [str(when) for when in array.floor('day')]
+            ['2015-03-07 00:00:00-05:00', '2015-03-08 00:00:00-05:00', '2015-03-09 00:00:00-04:00']
+            >>> numpy.unique(array.floor('day').epochs).size
+            3
+            
+        """
+        floors, ceilings, timezone = self._buckets(unit, timezone)
+        return self._from_epochs(floors, timezone)
+
+    def ceil(self, unit, timezone=None):
+        floors, ceilings, timezone = self._buckets(unit, timezone)
+        epochs = numpy.where(floors == self._epochs, floors, ceilings)
+        return self._from_epochs(epochs, timezone)
+
+    def round(self, unit, timezone=None):
+        floors, ceilings, timezone = self._buckets(unit, timezone)
+        nearer = self._epochs - floors < ceilings - self._epochs
+        return self._from_epochs(numpy.where(nearer, floors, ceilings), timezone)
+
+    # timezone-related
+
+    @property
+    def timezone(self):
+        return timezones[self._timezone]
+
+    @timezone.setter
+    def timezone(self, timezone):
+        """ Set the timezone view shared by every element.
+
+        """
+        if timezone not in timezones:
+            raise ValueError('You must supply a valid timezone.')
+        self._timezone = timezone
+
+    # container protocol
+
+    def __len__(self):
+        return len(self._epochs)
+
+    def __iter__(self):
+        return iter(self.to_whens())
+
+    def __getitem__(self, item):
+        epochs = self._epochs[item]
+        if isinstance(epochs, numpy.ndarray):
+            return self._from_epochs(epochs, self._timezone)
+        return When._from_epoch(int(epochs), self._timezone)
+
+    # sorting
+
+    def argsort(self):
+        return numpy.argsort(self._epochs, kind='stable')
+
+    def sort(self):
+        """ Sort the instants in place.
+
+        """
+        self._epochs.sort(kind='stable')
+
+    # comparison
+
+    def _comparable(self, other):
+        if isinstance(other, WhenArray):
+            return other._epochs
+        elif isinstance(other, When):
+            return other._epoch
+        else:
+            return None
+
+    def __eq__(self, other):
+        other = self._comparable(other)
+        if other is None:
+            return NotImplemented
+        return self._epochs == other
+
+    def __ne__(self, other):
+        other = self._comparable(other)
+        if other is None:
+            return NotImplemented
+        return self._epochs != other
+
+    def __lt__(self, other):
+        other = self._comparable(other)
+        if other is None:
+            return NotImplemented
+        return self._epochs < other
+
+    def __le__(self, other):
+        other = self._comparable(other)
+        if other is None:
+            return NotImplemented
+        return self._epochs <= other
+
+    def __gt__(self, other):
+        other = self._comparable(other)
+        if other is None:
+            return NotImplemented
+        return self._epochs > other
+
+    def __ge__(self, other):
+        other = self._comparable(other)
+        if other is None:
+            return NotImplemented
+        return self._epochs >= other
+
+    __hash__ = None
+
+    # arithmetic
+
+    def __add__(self, other):
+        microseconds = _microseconds(other)
+        if microseconds is None:
+            return NotImplemented
+        return self._from_epochs(self._epochs + microseconds, self._timezone)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        """ Subtract a While or timedelta (giving a WhenArray), or a When or
+            WhenArray (giving a timedelta64[us] array).
+
+            >>> array = WhenArray([0, 1000000])
+            >>> array - When(1970, 1, 1, timezone='utc')
+            array([      0, 1000000], dtype='timedelta64[us]')
+
+        """
+        microseconds = _microseconds(other)
+        if microseconds is not None:
+            return self._from_epochs(self._epochs - microseconds, self._timezone)
+        other = self._comparable(other)
+        if other is None:
+            return NotImplemented
+        return (self._epochs - other).view('timedelta64[us]')
+
+    # representation
+
+    def __repr__(self):
+        values = numpy.datetime_as_string(self.datetime64).tolist()
+        return '{}({}, timezone={!r})'.format(self.__class__.__name__, values,
+                                             self._timezone)
@@ -0,0 +1,62 @@
+# standard libraries
+import struct
+# third party libraries
+pass
+# first party libraries
+from . import zone_table
+from .timezones import timezones
+
+
+__all__ = ('when_struct', 'while_struct', 'unlisted', 'zone_id', 'zone_name', )
+
+
+# a When is its epoch microseconds and the id of its timezone view; a While is
+# just its microseconds
+when_struct = struct.Struct('<qH')
+while_struct = struct.Struct('<q')
+# the id reserved for a zone missing from the table (one that pytz added after
+# the table was last extended); ```When.to_bytes``` follows it with the name
+unlisted = 0xFFFF
+
+
+# zone ids index the frozen, append-only table in ```zone_table```, so they
+# mean the same zone whatever pytz release reads them; 'utc' comes first since
+# it is the usual view
+_table_ids = {name: id for id, name in enumerate(zone_table.names)}
+# ids of the names asked for so far, in whatever case they were spelled
+_ids = {}
+
+
+def zone_id(name):
+    """ The small integer id of the timezone called ```name```.
+
+        Names are matched case-insensitively, so an id decodes to the
+        canonical spelling of the zone.
+
+        >>> zone_name(zone_id('america/new_york'))
+        'America/New_York'
+        >>> zone_id('utc')
+        0
+
+        Ids are fixed for good, whatever pytz release is installed.
+
+        >>> zone_id('America/New_York'), zone_id('Europe/London')
+        (171, 455)
+
+    """
+    try:
+        return _ids[name]
+    except KeyError:
+        pass
+    canonical = name if name == 'utc' else timezones[name].name
+    try:
+        id = _table_ids[canonical]
+    except KeyError:
+        error = '{!r} has no id yet; append it to when/zone_table.py.'
+        raise ValueError(error.format(canonical))
+    _ids[name] = id
+    return id
+
+
+def zone_name(id):
+    return zone_table.names[id]
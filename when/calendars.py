@@ -0,0 +1,243 @@
+# standard libraries
+import re
+import datetime
+# third party libraries
+pass
+# first party libraries
+pass
+
+
+__all__ = ('parse_step', 'shift', 'shift_many', 'parse_unit', 'floor_local', 
+           'floor_local_many', 'next_local', 'next_local_many', 'bucket', )
+
+
+_day = 86400000000
+_epoch_ordinal = datetime.date(1970, 1, 1).toordinal()
+# the days since the epoch of the first Monday, which weeks are aligned to
+_monday = 4
+
+
+# calendar steps all reduce to a whole number of local days or of months
+_units = {
+    'day': ('day', 1),
+    'week': ('day', 7),
+    'month': ('month', 1),
+    'quarter': ('month', 3),
+    'year': ('month', 12),
+}
+
+
+_step_regex = re.compile(r'\s*([+-]?\d+)?\s*([a-z]+?)s?\s*\Z')
+
+
+def parse_step(step):
+    """ Parse a calendar step such as ```'day'``` or ```'3 months'``` into a
+        ```(unit, count)``` tuple, where ```unit``` is ```'day'``` or
+        ```'month'```.
+
+        >>> parse_step('day'), parse_step('2 weeks'), parse_step('-1 year')
+        (('day', 1), ('day', 14), ('month', -12))
+        >>> parse_step('fortnight')
+        Traceback (most recent call last):
+        ...
+        ValueError: 'fortnight' is not a calendar step.
+        >>> parse_step(3600)
+        Traceback (most recent call last):
+        ...
+        TypeError: A step must be a While, timedelta or calendar string.
+
+    """
+    if not isinstance(step, str):
+        raise TypeError('A step must be a While, timedelta or calendar string.')
+    match = _step_regex.match(step.lower())
+    if match is None or match.group(2) not in _units:
+        raise ValueError('{!r} is not a calendar step.'.format(step))
+    count, name = match.groups()
+    unit, size = _units[name]
+    count = size*(1 if count is None else int(count))
+    if count == 0:
+        raise ValueError('A step must not be zero.')
+    return unit, count
+
+
+def _days_in_month(year, month):
+    if month == 12:
+        return 31
+    return (datetime.date(year, month + 1, 1) - datetime.date(year, month, 1)).days
+
+
+def shift(local, unit, count):
+    """ Move local wall-clock microseconds by ```count``` days or months.
+
+        The time of day is kept, and shifting by months clamps the day to the
+        end of shorter months.
+
+        >>> local = (datetime.date(2015, 1, 31).toordinal() - _epoch_ordinal)*_day
+        >>> datetime.date.fromordinal(_epoch_ordinal + shift(local, 'month', 1)//_day)
+        datetime.date(2015, 2, 28)
+
+    """
+    if unit == 'day':
+        return local + count*_day
+    days, time = divmod(local, _day)
+    date = datetime.date.fromordinal(_epoch_ordinal + days)
+    months = date.year*12 + date.month - 1 + count
+    year, month = divmod(months, 12)
+    month += 1
+    day = min(date.day, _days_in_month(year, month))
+    days = datetime.date(year, month, day).toordinal() - _epoch_ordinal
+    return days*_day + time
+
+
+def shift_many(local, unit, counts):
+    """ Shift one local time by each of an int64 array of ```counts```, with
+        the same results as ```shift``` (this requires NumPy).
+
+    """
+    import numpy
+    if unit == 'day':
+        return local + counts*_day
+    days, time = divmod(local, _day)
+    date = numpy.datetime64(datetime.date.fromordinal(_epoch_ordinal + days), 'D')
+    months = date.astype('datetime64[M]') + counts
+    firsts = months.astype('datetime64[D]')
+    lengths = (months + 1).astype('datetime64[D]') - firsts
+    day = (date - date.astype('datetime64[M]').astype('datetime64[D]'))
+    offsets = numpy.minimum(day, lengths - 1)
+    days = (firsts + offsets).astype(numpy.int64)
+    return days*_day + time
+
+
+# units of truncation; fixed units are a number of microseconds, calendar units
+# are counted in local days, weeks or months
+_fixed = {
+    'microsecond': 1,
+    'millisecond': 1000,
+    'second': 1000000,
+    'minute': 60000000,
+    'hour': 3600000000,
+}
+_periods = {
+    'day': ('day', 1),
+    'week': ('week', 1),
+    'month': ('month', 1),
+    'quarter': ('month', 3),
+    'year': ('month', 12),
+}
+
+
+def parse_unit(unit):
+    """ Parse a unit of truncation such as ```'hour'```, ```'15 minutes'``` or
+        ```'month'``` into a ```(unit, count)``` tuple.
+
+        Fixed units give ```('fixed', microseconds)```; calendar units give
+        ```'day'```, ```'week'``` or ```'month'``` and how many of them.
+
+        >>> parse_unit('15 minutes'), parse_unit('quarter'), parse_unit('week')
+        (('fixed', 900000000), ('month', 3), ('week', 1))
+        >>> parse_unit(60)
+        Traceback (most recent call last):
+        ...
+        TypeError: A unit must be a string such as 'hour' or '15 minutes'.
+
+    """
+    if not isinstance(unit, str):
+        raise TypeError("A unit must be a string such as 'hour' or '15 minutes'.")
+    match = _step_regex.match(unit.lower())
+    name = None if match is None else match.group(2)
+    if name not in _fixed and name not in _periods:
+        raise ValueError('{!r} is not a unit of time.'.format(unit))
+    count = 1 if match.group(1) is None else int(match.group(1))
+    if count <= 0:
+        raise ValueError('A unit must be a positive number of {}s.'.format(name))
+    if name in _fixed:
+        return 'fixed', count*_fixed[name]
+    unit, size = _periods[name]
+    return unit, count*size
+
+
+def floor_local(local, unit, count):
+    """ The local midnight starting the calendar period that contains the 
+        local wall-clock time ```local```.
+        
+        Days are counted from the epoch, weeks start on Mondays and months 
+        from the start of the year, so that quarters start in January, April,
+        July and October.
+
+        >>> local = (datetime.date(2015, 5, 20).toordinal() - _epoch_ordinal)*_day
+        >>> [datetime.date.fromordinal(_epoch_ordinal + floor_local(local, unit, count)//_day)
+        ...  for unit, count in (('week', 1), ('month', 3))]
+        [datetime.date(2015, 5, 18), datetime.date(2015, 4, 1)]
+
+    """
+    days = local//_day
+    if unit == 'day':
+        days -= days % count
+    elif unit == 'week':
+        days -= (days - _monday) % (7*count)
+    else:
+        date = datetime.date.fromordinal(_epoch_ordinal + days)
+        months = date.year*12 + date.month - 1
+        year, month = divmod(months - months % count, 12)
+        days = datetime.date(year, month + 1, 1).toordinal() - _epoch_ordinal
+    return days*_day
+
+
+def floor_local_many(local, unit, count):
+    """ ```floor_local``` of an int64 array of local times (this requires 
+        NumPy).
+        
+    """
+    import numpy
+    days = local//_day
+    if unit == 'day':
+        days = days - days % count
+    elif unit == 'week':
+        days = days - (days - _monday) % (7*count)
+    else:
+        # months since 1970-01, aligned from year 0 as in floor_local
+        months = days.astype('datetime64[D]').astype('datetime64[M]').astype(numpy.int64)
+        months = months - (months + 1970*12) % count
+        days = months.astype('datetime64[M]').astype('datetime64[D]').astype(numpy.int64)
+    return days*_day
+
+
+def next_local(start, unit, count):
+    """ The local midnight starting the period after the one starting at 
+        ```start```.
+        
+    """
+    if unit == 'week':
+        return start + 7*count*_day
+    return shift(start, unit, count)
+
+
+def next_local_many(starts, unit, count):
+    """ ```next_local``` of an int64 array of period starts (this requires 
+        NumPy).
+        
+    """
+    import numpy
+    if unit == 'week':
+        return starts + 7*count*_day
+    elif unit == 'day':
+        return starts + count*_day
+    months = (starts//_day).astype('datetime64[D]').astype('datetime64[M]') + count
+    return months.astype('datetime64[D]').astype(numpy.int64)*_day
+
+
+def bucket(zone, epoch, unit, count):
+    """ The UTC instants ```(floor, ceiling)``` bounding the period of the
+        ```Transitions``` ```zone``` that contains the instant ```epoch```.
+        
+        Fixed units are pure integer arithmetic on the local time; calendar
+        periods start at the first instant of their first local day.
+        
+    """
+    local = zone.to_local(epoch)
+    if unit == 'fixed':
+        floor = epoch - local % count
+        return floor, floor + count
+    start = floor_local(local, unit, count)
+    return (zone.first_utc(start), 
+            zone.first_utc(next_local(start, unit, count)))
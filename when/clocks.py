@@ -0,0 +1,157 @@
+# standard libraries
+import time
+import contextlib
+# third party libraries
+pass
+# first party libraries
+pass
+
+
+__all__ = ('SystemClock', 'CoarseClock', 'ManualClock', 'get_clock',
+           'set_clock', 'using', )
+
+
+def _epoch_of(instant):
+    # Whens are read as their epoch microseconds; ints are taken as is
+    try:
+        return instant._epoch
+    except AttributeError:
+        return int(instant)
+
+
+def _microseconds(duration):
+    # While, timedelta or a number of seconds as integer microseconds
+    try:
+        return duration._microseconds
+    except AttributeError:
+        pass
+    try:
+        seconds = duration.total_seconds()
+    except AttributeError:
+        seconds = duration
+    return int(round(1000000*seconds))
+
+
+class SystemClock(object):
+    """ The system's wall clock, read with ```time.time_ns```.
+
+        Clocks have a single method, ```epoch```, which returns the current
+        instant in integer microseconds since the UTC epoch.
+
+    """
+    def epoch(self):
+        return time.time_ns()//1000
+
+    def __repr__(self):
+        return '{}()'.format(self.__class__.__name__)
+
+
+class CoarseClock(object):
+    """ The system clock, truncated to a ```resolution``` (a While, timedelta
+        or number of seconds) and cached for the rest of each tick.
+
+        Every read within the same tick of ```resolution``` returns the same
+        instant, so events stamped close together compare equal and group
+        together.  The truncated instant is kept along with the monotonic
+        time at which its tick ends, so most reads are one monotonic clock
+        read and a comparison, and the wall clock is only read (and
+        truncated) once per tick.  Nothing refreshes the cache in the
+        background: a thread doing so costs more in contention for the
+        interpreter lock than it saves.
+
+        >>> clock = CoarseClock(resolution=0.01)
+        >>> clock.epoch() % 10000
+        0
+
+    """
+    def __init__(self, resolution=0.001):
+        self.resolution = _microseconds(resolution)
+        if self.resolution <= 0:
+            raise ValueError('The resolution must be positive.')
+        # (monotonic nanoseconds at which the tick ends, truncated instant),
+        # replaced as a whole so that concurrent reads never see a mix
+        self._cached = (0, 0)
+
+    def epoch(self):
+        ticks = time.monotonic_ns()
+        until, epoch = self._cached
+        if ticks < until:
+            return epoch
+        now = time.time_ns()
+        epoch = now//1000
+        epoch -= epoch % self.resolution
+        # the wall clock was read after the monotonic one, so the tick is
+        # taken to end a little early rather than late
+        self._cached = (ticks + 1000*(epoch + self.resolution) - now, epoch)
+        return epoch
+
+    def __repr__(self):
+        return '{}(resolution={}us)'.format(self.__class__.__name__,
+                                            self.resolution)
+
+
+class ManualClock(object):
+    """ A clock that only moves when told to, for deterministic tests.
+
+        >>> from .when import When
+        >>> from .while_ import While
+        >>> clock = ManualClock(When(2015, 4, 22, timezone='utc'))
+        >>> with using(clock):
+        ...     print(When.now('America/New_York'))
+        ...     clock.advance(While(hours=1))
+        ...     print(When.now())
+        2015-04-21 20:00:00-04:00
+        2015-04-22 01:00:00+00:00
+
+    """
+    def __init__(self, instant=0):
+        self._epoch = _epoch_of(instant)
+
+    def epoch(self):
+        return self._epoch
+
+    def set(self, instant):
+        """ Move the clock to ```instant```, a When or epoch microseconds.
+
+        """
+        self._epoch = _epoch_of(instant)
+
+    def advance(self, duration):
+        """ Move the clock on by ```duration```, a While, timedelta or a
+            number of seconds.
+
+        """
+        self._epoch += _microseconds(duration)
+
+    def __repr__(self):
+        return '{}({})'.format(self.__class__.__name__, self._epoch)
+
+
+# the clock behind When.now
+_clock = SystemClock()
+
+
+def get_clock():
+    return _clock
+
+
+def set_clock(clock):
+    """ Make ```clock``` the source of ```When.now```, returning the previous
+        clock.
+
+    """
+    global _clock
+    previous, _clock = _clock, clock
+    return previous
+
+
+@contextlib.contextmanager
+def using(clock):
+    """ Use ```clock``` as the source of ```When.now``` within a with block.
+
+    """
+    previous = set_clock(clock)
+    try:
+        yield clock
+    finally:
+        set_clock(previous)
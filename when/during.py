@@ -1,9 +1,12 @@
 # standard libraries
+import math
 import time
+import functools
+import contextvars
 # third party libraries
 pass
 # first party libraries
-from . import when
+from .while_ import While
 
 
 __all__ = ('sleep', 'Timer', 'tic', 'toc', )
@@ -12,29 +15,184 @@ __all__ = ('sleep', 'Timer', 'tic', 'toc', )
 def sleep(seconds):
     time.sleep(seconds)
 
-    
+
+def _while(nanoseconds):
+    return While._from_microseconds(int(round(nanoseconds/1000.0)))
+
+
 class Timer(object):
-    
+    """ A stopwatch on the monotonic, nanosecond ```time.perf_counter_ns```.
+
+        ```tic``` starts a measurement and ```toc``` (or ```lap```) ends it,
+        returning the While it took.  Every measurement is also folded into
+        running statistics (count, total, minimum, maximum, mean and standard
+        deviation, the latter two with Welford's method), so no samples are
+        kept.  A Timer also works as a ```with``` block and as a decorator,
+        timing each block or call.
+
+        >>> timer = Timer()
+        >>> with timer:
+        ...     sleep(0.001)
+        >>> @timer
+        ... def nap():
+        ...     sleep(0.002)
+        >>> nap()
+        >>> timer.count, timer.minimum.milliseconds >= 1, timer.maximum.milliseconds >= 2
+        (2, True, True)
+        >>> timer.minimum <= timer.mean <= timer.maximum
+        True
+        >>> timer.reset()
+        >>> timer.count, timer.mean
+        (0, None)
+
+    """
     def __init__(self):
+        self.reset()
         self.tic()
-        
+
+    def reset(self):
+        """ Forget every measurement made so far.
+
+        """
+        self.count = 0
+        self._total = 0
+        self._minimum = None
+        self._maximum = None
+        self._mean = 0.0
+        self._squares = 0.0
+
     def tic(self):
-        self.awhile = None
         self.stopped = None
-        self.started = when.now()
-        
+        self.started = self._lapped = time.perf_counter_ns()
+
     def toc(self):
-        self.stopped = when.now()
-        self.awhile = self.stopped - self.started
-        return self.awhile
+        """ Return (and record) the While since ```tic```.
+
+            Only the first ```toc``` after a ```tic``` is recorded: another
+            one still returns the While since ```tic```, but that overlaps the
+            measurement already taken, so it isn't counted again.
+
+            >>> timer = Timer()
+            >>> first, second = timer.toc(), timer.toc()
+            >>> first <= second, timer.count
+            (True, 1)
+
+        """
+        recorded = self.stopped is not None
+        self.stopped = time.perf_counter_ns()
+        elapsed = self.stopped - self.started
+        if not recorded:
+            self._record(elapsed)
+        return _while(elapsed)
+
+    @property
+    def awhile(self):
+        """ The While between the last ```tic``` and the ```toc``` after it.
+
+        """
+        if self.stopped is None:
+            return None
+        return _while(self.stopped - self.started)
+
+    def lap(self):
+        """ Return (and record) the While since ```tic``` or the last lap.
+
+        """
+        now = time.perf_counter_ns()
+        elapsed, self._lapped = now - self._lapped, now
+        self._record(elapsed)
+        return _while(elapsed)
 
+    def _record(self, nanoseconds):
+        self.count += 1
+        self._total += nanoseconds
+        if self._minimum is None or nanoseconds < self._minimum:
+            self._minimum = nanoseconds
+        if self._maximum is None or nanoseconds > self._maximum:
+            self._maximum = nanoseconds
+        delta = nanoseconds - self._mean
+        self._mean += delta/self.count
+        self._squares += delta*(nanoseconds - self._mean)
 
-timer = Timer()
+    # statistics
+
+    @property
+    def total(self):
+        return _while(self._total)
+
+    @property
+    def minimum(self):
+        return None if self._minimum is None else _while(self._minimum)
+
+    @property
+    def maximum(self):
+        return None if self._maximum is None else _while(self._maximum)
+
+    @property
+    def mean(self):
+        return _while(self._mean) if self.count > 0 else None
+
+    @property
+    def stddev(self):
+        """ The sample standard deviation of the measurements.
+
+        """
+        if self.count < 2:
+            return None
+        return _while(math.sqrt(self._squares/(self.count - 1)))
+
+    # context manager and decorator
+
+    def __enter__(self):
+        self.tic()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.stopped = time.perf_counter_ns()
+        self._record(self.stopped - self.started)
+
+    def __call__(self, function):
+        # each call keeps its own start, so recursive calls time correctly
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            started = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self._record(time.perf_counter_ns() - started)
+        return timed
+
+    def __repr__(self):
+        return '{}(count={}, mean={!r})'.format(self.__class__.__name__,
+                                                self.count, self.mean)
+
+
+# the start of the module-level tic/toc is kept per thread and asyncio task, so
+# concurrent measurements don't overwrite each other; it defaults to the import
+_started = contextvars.ContextVar('started', default=time.perf_counter_ns())
 
 
 def tic():
-    timer.tic()
+    _started.set(time.perf_counter_ns())
+
 
-    
 def toc():
-    return timer.toc()
+    """ Return the While since the last ```tic``` in this thread or task.
+
+        >>> import threading
+        >>> def measure(seconds, results):
+        ...     tic()
+        ...     sleep(seconds)
+        ...     results.append(toc())
+        >>> results = []
+        >>> threads = [threading.Thread(target=measure, args=(seconds, results))
+        ...            for seconds in (0.05, 0.001)]
+        >>> for thread in threads:
+        ...     thread.start()
+        >>> for thread in threads:
+        ...     thread.join()
+        >>> [awhile.seconds < 0.01 for awhile in results]
+        [True, False]
+
+    """
+    return _while(time.perf_counter_ns() - _started.get())
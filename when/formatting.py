@@ -0,0 +1,216 @@
+# standard libraries
+import functools
+# third party libraries
+pass
+# first party libraries
+from . import substitutions
+
+
+__all__ = ('Plan', 'compile', )
+
+
+# field emitters; each is called as emit(datetime, timezone_name) with the
+# local datetime of the instant being formatted
+
+def _year(datetime, timezone):
+    return datetime.strftime('%Y')
+
+
+def _two_digit_year(datetime, timezone):
+    return '{:02d}'.format(datetime.year % 100)
+
+
+def _month_name(datetime, timezone):
+    return datetime.strftime('%B')
+
+
+def _abbreviated_month_name(datetime, timezone):
+    return datetime.strftime('%b')
+
+
+def _zero_padded_month(datetime, timezone):
+    return '{:02d}'.format(datetime.month)
+
+
+def _month(datetime, timezone):
+    return '{:02d}'.format(datetime.month).lstrip('0')
+
+
+def _zero_padded_day(datetime, timezone):
+    return '{:02d}'.format(datetime.day)
+
+
+def _day(datetime, timezone):
+    return '{:02d}'.format(datetime.day).lstrip('0')
+
+
+def _inflection(datetime, timezone):
+    day = datetime.day
+    if day in (1, 21, 31):
+        return 'st'
+    elif day in (2, 22):
+        return 'nd'
+    elif day in (3, 23):
+        return 'rd'
+    else:
+        return 'th'
+
+
+def _weekday_name(datetime, timezone):
+    return datetime.strftime('%A')
+
+
+def _abbreviated_weekday_name(datetime, timezone):
+    return datetime.strftime('%a')
+
+
+def _twelve_hour(datetime):
+    return datetime.hour % 12 or 12
+
+
+def _zero_padded_hour_12(datetime, timezone):
+    return '{:02d}'.format(_twelve_hour(datetime))
+
+
+def _hour_12(datetime, timezone):
+    return '{:02d}'.format(_twelve_hour(datetime)).lstrip('0')
+
+
+def _zero_padded_hour_24(datetime, timezone):
+    return '{:02d}'.format(datetime.hour)
+
+
+def _zero_padded_minute(datetime, timezone):
+    return '{:02d}'.format(datetime.minute)
+
+
+def _minute(datetime, timezone):
+    return '{:02d}'.format(datetime.minute).lstrip('0')
+
+
+def _zero_padded_second(datetime, timezone):
+    return '{:02d}'.format(datetime.second)
+
+
+def _second(datetime, timezone):
+    return '{:02d}'.format(datetime.second).lstrip('0')
+
+
+def _zero_padded_millisecond(datetime, timezone):
+    return '{:06d}'.format(datetime.microsecond)[:3]
+
+
+def _millisecond(datetime, timezone):
+    return '{:06d}'.format(datetime.microsecond)[:3].lstrip('0')
+
+
+def _zero_padded_microsecond(datetime, timezone):
+    return '{:06d}'.format(datetime.microsecond)
+
+
+def _microsecond(datetime, timezone):
+    return '{:06d}'.format(datetime.microsecond).lstrip('0')
+
+
+def _utc_offset_with_colon(datetime, timezone):
+    offset = datetime.strftime('%z')
+    return '{}:{}'.format(offset[:-2], offset[-2:])
+
+
+def _utc_offset(datetime, timezone):
+    return datetime.strftime('%z')
+
+
+def _timezone_name(datetime, timezone):
+    return timezone
+
+
+def _meridian(am, pm):
+    def emit(datetime, timezone):
+        return am if datetime.hour < 12 else pm
+    return emit
+
+
+# tokens of the reference date and the emitters that replace them
+_emitters = {
+    '1776': _year,
+    '76': _two_digit_year,
+    'July': _month_name,
+    'Jul': _abbreviated_month_name,
+    '07': _zero_padded_month,
+    '7': _month,
+    '04': _zero_padded_day,
+    '4': _day,
+    'th': _inflection,
+    'Thursday': _weekday_name,
+    'Thu': _abbreviated_weekday_name,
+    '01': _zero_padded_hour_12,
+    '1': _hour_12,
+    '13': _zero_padded_hour_24,
+    '02': _zero_padded_minute,
+    '2': _minute,
+    '03': _zero_padded_second,
+    '3': _second,
+    '012': _zero_padded_millisecond,
+    '12': _millisecond,
+    '012345': _zero_padded_microsecond,
+    '12345': _microsecond,
+    '-04:00': _utc_offset_with_colon,
+    '-0400': _utc_offset,
+    'America/New_York': _timezone_name,
+    'PM': _meridian('AM', 'PM'),
+    'P.M.': _meridian('A.M.', 'P.M.'),
+    'pm': _meridian('am', 'pm'),
+    'p.m.': _meridian('a.m.', 'p.m.'),
+}
+
+
+_tokenizer = substitutions.Substitutor(_emitters)
+
+
+class Plan(object):
+    """ A format specifier tokenized once into literal text and emitters.
+
+        Plans hold no state about any particular instant, so one plan is
+        shared by every When formatted with the same specifier, and only the
+        fields the specifier references are computed.
+
+        >>> import datetime
+        >>> plan = Plan('Jul 4th, 1776')
+        >>> plan(datetime.datetime(2015, 4, 22), 'utc')
+        'Apr 22nd, 2015'
+        >>> [piece for piece in plan.pieces if isinstance(piece, str)]
+        [' ', ', ']
+
+    """
+    def __init__(self, specifier):
+        self.specifier = specifier
+        pieces = []
+        for text, is_token in _tokenizer.tokenize(specifier):
+            pieces.append(_emitters[text] if is_token else text)
+        self.pieces = tuple(pieces)
+        self._literal = ''.join(pieces) if all(isinstance(piece, str) for
+                                               piece in pieces) else None
+
+    def __call__(self, datetime, timezone):
+        """ Format the local ```datetime``` viewed in zone ```timezone```.
+
+        """
+        if self._literal is not None:
+            return self._literal
+        return ''.join([piece if isinstance(piece, str) else
+                        piece(datetime, timezone) for piece in self.pieces])
+
+    def __repr__(self):
+        return '{}({!r})'.format(self.__class__.__name__, self.specifier)
+
+
+@functools.lru_cache(maxsize=256)
+def compile(specifier):
+    """ Return the (cached) Plan for ```specifier```.
+
+        >>> compile('1776-07-04') is compile('1776-07-04')
+        True
+
+    """
+    return Plan(specifier)
@@ -0,0 +1,171 @@
+# standard libraries
+import time
+import functools
+# third party libraries
+pass
+# first party libraries
+from . import when, parsing, formatting, transitions
+
+
+__all__ = ('enable', 'disable', 'enabled', 'snapshot', 'reset', )
+
+
+# the hot paths that are counted, as (label, owner, attribute); nested calls
+# are counted at every level, so eg from_string includes the __init__ it calls
+_operations = (
+    ('When.__init__', when.When, '__init__'),
+    ('When.now', when.When, 'now'),
+    ('When.from_string', when.When, 'from_string'),
+    ('When.from_iso_format', when.When, 'from_iso_format'),
+    ('When.__format__', when.When, '__format__'),
+    ('When.timezone', when.When, 'timezone'),
+    ('When.__add__', when.When, '__add__'),
+    ('When.__sub__', when.When, '__sub__'),
+    ('Transitions.to_utc', transitions.Transitions, 'to_utc'),
+    ('Transitions.local_datetime', transitions.Transitions, 'local_datetime'),
+)
+
+
+# caches whose hits and misses are reported
+_lru_caches = (
+    ('parsing.compile', parsing.compile),
+    ('formatting.compile', formatting.compile),
+)
+
+
+class _Counter(object):
+
+    __slots__ = ('calls', 'nanoseconds', )
+
+    def __init__(self):
+        self.calls = 0
+        self.nanoseconds = 0
+
+
+_counters = {label: _Counter() for label, owner, attribute in _operations}
+_zone_lookups = {'hits': 0, 'misses': 0}
+_lru_baselines = {}
+_originals = {}
+
+
+def _counted(function, counter):
+    perf_counter_ns = time.perf_counter_ns
+    @functools.wraps(function)
+    def counted(*args, **kwargs):
+        started = perf_counter_ns()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            counter.calls += 1
+            counter.nanoseconds += perf_counter_ns() - started
+    return counted
+
+
+def _instrumented(original, counter):
+    if isinstance(original, classmethod):
+        return classmethod(_counted(original.__func__, counter))
+    elif isinstance(original, staticmethod):
+        return staticmethod(_counted(original.__func__, counter))
+    elif isinstance(original, property):
+        # only setting a timezone view does any work worth counting
+        return property(original.fget, _counted(original.fset, counter),
+                        original.fdel, original.__doc__)
+    else:
+        return _counted(original, counter)
+
+
+def _counted_lookup(of):
+    by_name = transitions._by_name
+    @functools.wraps(of)
+    def lookup(name):
+        if name in by_name:
+            _zone_lookups['hits'] += 1
+        else:
+            _zone_lookups['misses'] += 1
+        return of(name)
+    return lookup
+
+
+def enabled():
+    return len(_originals) > 0
+
+
+def enable():
+    """ Start counting calls to the hot paths of ```when```.
+
+        The counted methods are swapped in for the originals, which
+        ```disable``` puts back, so there is no cost at all while
+        instrumentation is disabled.  Counters are plain integers updated
+        without a lock, so counts from many threads are approximate.
+
+        >>> enable()
+        >>> earth_day = when.When(2015, 4, 22, timezone='America/New_York')
+        >>> earth_day.timezone = 'utc'
+        >>> counts = snapshot()
+        >>> counts['operations']['When.__init__']['calls']
+        1
+        >>> counts['operations']['When.timezone']['calls']
+        1
+        >>> disable()
+        >>> reset()
+        >>> earth_day.timezone = 'America/New_York'
+        >>> snapshot()['operations']['When.timezone']['calls']
+        0
+
+    """
+    if enabled():
+        return
+    for label, owner, attribute in _operations:
+        original = owner.__dict__[attribute]
+        _originals[label] = (owner, attribute, original)
+        setattr(owner, attribute, _instrumented(original, _counters[label]))
+    _originals['transitions.of'] = (transitions, 'of', transitions.of)
+    transitions.of = _counted_lookup(transitions.of)
+
+
+def disable():
+    """ Stop counting, restoring the original methods.  Counts are kept
+        until ```reset```.
+
+    """
+    for owner, attribute, original in _originals.values():
+        setattr(owner, attribute, original)
+    _originals.clear()
+
+
+def reset():
+    """ Zero every counter.
+
+    """
+    for counter in _counters.values():
+        counter.calls = 0
+        counter.nanoseconds = 0
+    _zone_lookups['hits'] = _zone_lookups['misses'] = 0
+    for label, cache in _lru_caches:
+        info = cache.cache_info()
+        _lru_baselines[label] = (info.hits, info.misses)
+
+
+def snapshot():
+    """ Return the counts since the last ```reset```.
+
+        ```'operations'``` maps each counted method to its ```'calls'``` and
+        cumulative ```'nanoseconds'```, and ```'caches'``` maps each cache to
+        its ```'hits'``` and ```'misses'``` (and size, for the bounded LRU
+        caches of compiled parse and format plans).
+
+    """
+    operations = {label: {'calls': counter.calls,
+                          'nanoseconds': counter.nanoseconds}
+                  for label, counter in _counters.items()}
+    caches = {'transitions.of': dict(_zone_lookups,
+                                     currsize=len(transitions._by_name))}
+    for label, cache in _lru_caches:
+        info = cache.cache_info()
+        hits, misses = _lru_baselines.get(label, (0, 0))
+        caches[label] = {'hits': info.hits - hits, 'misses': info.misses - misses,
+                         'currsize': info.currsize, 'maxsize': info.maxsize}
+    return {'operations': operations, 'caches': caches}
+
+
+reset()
@@ -0,0 +1,299 @@
+# standard libraries
+import bisect
+# third party libraries
+pass
+# first party libraries
+from .timezones import timezones
+
+
+__all__ = ('WhenIndex', )
+
+
+def _epoch_of(instant):
+    # Whens are indexed by their epoch microseconds; ints are taken as is
+    try:
+        return instant._epoch
+    except AttributeError:
+        return int(instant)
+
+
+# reach of the padding leaves of the tree of block reaches
+_unreached = float('-inf')
+
+
+def _reach(start, end):
+    # intervals are half-open, [start, end); an empty interval is a single
+    # event, which is treated as reaching just past its start
+    return end if end > start else start + 1
+
+
+class WhenIndex(object):
+    """ An index of intervals (and single events) keyed by integer instants.
+
+        Intervals are ```[start, end)``` pairs of Whens (or epoch
+        microseconds), each carrying an arbitrary value; an interval whose end
+        is None or not after its start is a single event at ```start```.
+        They are kept sorted by start in blocks of a few hundred entries, and
+        every block remembers the furthest any of its intervals reaches, in
+        a max segment tree over the blocks.  Queries bisect to the last block
+        that starts early enough and descend the tree to the blocks before it
+        that reach far enough, so blocks that end too early are never
+        visited, let alone looked inside, and a query takes logarithmic time
+        plus the hits.  Inserting or removing an interval only touches one
+        block and its path up the tree.
+
+        Queries are generators of ```(start, end, value)``` tuples, and the
+        Whens in them are only built for the hits, in the index's timezone.
+
+        >>> from .when import When
+        >>> index = WhenIndex([
+        ...     (When(2015, 4, 22, 9, timezone='utc'),
+        ...      When(2015, 4, 22, 17, timezone='utc'), 'workday'),
+        ...     (When(2015, 4, 22, 12, timezone='utc'),
+        ...      When(2015, 4, 22, 13, timezone='utc'), 'lunch'),
+        ...     (When(2015, 4, 22, 20, timezone='utc'), None, 'deploy'),
+        ... ])
+        >>> [value for start, end, value in
+        ...  index.at(When(2015, 4, 22, 12, 30, timezone='utc'))]
+        ['workday', 'lunch']
+        >>> [value for start, end, value in
+        ...  index.overlapping(When(2015, 4, 22, 16, timezone='utc'),
+        ...                    When(2015, 4, 23, timezone='utc'))]
+        ['workday', 'deploy']
+        >>> index.remove(When(2015, 4, 22, 20, timezone='utc'), None, 'deploy')
+        >>> len(index)
+        2
+
+    """
+    _load = 256
+
+    def __init__(self, intervals=(), timezone='utc'):
+        if timezone not in timezones:
+            raise ValueError('You must supply a valid timezone.')
+        self.timezone = timezone
+        entries = []
+        for interval in intervals:
+            start, end, value = interval
+            start = _epoch_of(start)
+            end = start if end is None else _epoch_of(end)
+            entries.append((start, end, value))
+        # bulk loading sorts once and cuts the result into blocks
+        entries.sort(key=lambda entry: (entry[0], entry[1]))
+        load = self._load
+        self._starts = []
+        self._ends = []
+        self._values = []
+        for offset in range(0, len(entries), load):
+            block = entries[offset:offset + load]
+            self._starts.append([entry[0] for entry in block])
+            self._ends.append([entry[1] for entry in block])
+            self._values.append([entry[2] for entry in block])
+        self._firsts = [starts[0] for starts in self._starts]
+        self._reaches = [self._block_reach(i) for i in range(len(self._starts))]
+        self._lengths = [self._block_length(i) for i in range(len(self._starts))]
+        self._rebuild()
+        self._length = len(entries)
+
+    def _block_reach(self, i):
+        return max(_reach(start, end) for start, end in
+                   zip(self._starts[i], self._ends[i]))
+
+    def _block_length(self, i):
+        # the longest interval in the block, so that a query only needs to
+        # look inside it from the entries starting that long before it
+        return max(_reach(start, end) - start for start, end in
+                   zip(self._starts[i], self._ends[i]))
+
+    def _rebuild(self):
+        # the tree of block reaches, rebuilt whenever blocks come or go:
+        # node 1 is the root, the children of node n are 2n and 2n + 1, and
+        # the leaves, from node ```_size``` on, are the blocks' reaches
+        size = 1
+        while size < len(self._reaches):
+            size *= 2
+        tree = [_unreached]*size + self._reaches + \
+            [_unreached]*(size - len(self._reaches))
+        for node in range(size - 1, 0, -1):
+            tree[node] = max(tree[2*node], tree[2*node + 1])
+        self._size = size
+        self._tree = tree
+
+    def _set_reach(self, i, reach):
+        self._reaches[i] = reach
+        tree = self._tree
+        node = self._size + i
+        tree[node] = reach
+        node //= 2
+        while node > 0:
+            tree[node] = max(tree[2*node], tree[2*node + 1])
+            node //= 2
+
+    def _reaching(self, last, low):
+        # the blocks before ```last``` that reach past ```low```, in order,
+        # pruning every subtree that starts too late or reaches too little
+        tree, size = self._tree, self._size
+        pending = [(1, 0, size)]
+        while pending:
+            node, first, width = pending.pop()
+            if first >= last or tree[node] <= low:
+                continue
+            if node >= size:
+                yield first
+                continue
+            width //= 2
+            pending.append((2*node + 1, first + width, width))
+            pending.append((2*node, first, width))
+
+    def _block_of(self, start):
+        i = bisect.bisect_right(self._firsts, start) - 1
+        return i if i > 0 else 0
+
+    # modification
+
+    def add(self, start, end=None, value=None):
+        """ Insert the interval ```[start, end)``` (or the event at
+            ```start```, if ```end``` is None) carrying ```value```.
+
+        """
+        start = _epoch_of(start)
+        end = start if end is None else _epoch_of(end)
+        if self._length == 0:
+            self._starts.append([start])
+            self._ends.append([end])
+            self._values.append([value])
+            self._firsts.append(start)
+            self._reaches.append(_reach(start, end))
+            self._lengths.append(_reach(start, end) - start)
+            self._rebuild()
+            self._length = 1
+            return
+        i = self._block_of(start)
+        starts, ends, values = self._starts[i], self._ends[i], self._values[i]
+        position = bisect.bisect_right(starts, start)
+        starts.insert(position, start)
+        ends.insert(position, end)
+        values.insert(position, value)
+        self._firsts[i] = starts[0]
+        reach = _reach(start, end)
+        if reach > self._reaches[i]:
+            self._set_reach(i, reach)
+        if reach - start > self._lengths[i]:
+            self._lengths[i] = reach - start
+        self._length += 1
+        if len(starts) > 2*self._load:
+            self._split(i)
+
+    def _split(self, i):
+        half = len(self._starts[i])//2
+        for blocks in (self._starts, self._ends, self._values):
+            block = blocks[i]
+            blocks[i:i + 1] = [block[:half], block[half:]]
+        self._firsts[i:i + 1] = [self._starts[i][0], self._starts[i + 1][0]]
+        self._reaches[i:i + 1] = [self._block_reach(i), self._block_reach(i + 1)]
+        self._lengths[i:i + 1] = [self._block_length(i), self._block_length(i + 1)]
+        self._rebuild()
+
+    def remove(self, start, end=None, value=None):
+        """ Remove an interval added with the same ```start```, ```end``` and
+            ```value```, raising KeyError if there is none.
+
+        """
+        start = _epoch_of(start)
+        end = start if end is None else _epoch_of(end)
+        i = bisect.bisect_left(self._firsts, start) - 1
+        i = i if i > 0 else 0
+        # equal starts may spill over from one block into the next
+        while i < len(self._starts) and self._firsts[i] <= start:
+            starts, ends, values = self._starts[i], self._ends[i], self._values[i]
+            position = bisect.bisect_left(starts, start)
+            while position < len(starts) and starts[position] == start:
+                if ends[position] == end and values[position] == value:
+                    self._delete(i, position)
+                    return
+                position += 1
+            i += 1
+        raise KeyError((start, end, value))
+
+    def _delete(self, i, position):
+        starts = self._starts[i]
+        del starts[position]
+        del self._ends[i][position]
+        del self._values[i][position]
+        self._length -= 1
+        if len(starts) == 0:
+            for blocks in (self._starts, self._ends, self._values,
+                           self._firsts, self._reaches, self._lengths):
+                del blocks[i]
+            self._rebuild()
+        else:
+            self._firsts[i] = starts[0]
+            self._set_reach(i, self._block_reach(i))
+            self._lengths[i] = self._block_length(i)
+
+    # queries
+
+    def _hits(self, blocks, low, high):
+        # yield (start, end, value) for the entries of ```blocks``` starting
+        # before ```high``` and reaching past ```low```
+        from .when import When
+        from_epoch = When._from_epoch
+        timezone = self.timezone
+        for i in blocks:
+            starts, ends, values = self._starts[i], self._ends[i], self._values[i]
+            for position in range(bisect.bisect_left(starts, low - self._lengths[i] + 1),
+                                  bisect.bisect_left(starts, high)):
+                start, end = starts[position], ends[position]
+                if _reach(start, end) > low:
+                    yield (from_epoch(start, timezone),
+                           from_epoch(end, timezone) if end > start else None,
+                           values[position])
+
+    def overlapping(self, start, stop):
+        """ Lazily yield the intervals that overlap ```[start, stop)```, in
+            order of their starts.
+
+        """
+        start, stop = _epoch_of(start), _epoch_of(stop)
+        last = bisect.bisect_left(self._firsts, stop)
+        return self._hits(self._reaching(last, start), start, stop)
+
+    def at(self, instant):
+        """ Lazily yield the intervals in force at ```instant```.
+
+        """
+        instant = _epoch_of(instant)
+        return self.overlapping(instant, instant + 1)
+
+    def starting(self, start, stop):
+        """ Lazily yield the intervals that start within ```[start, stop)```.
+
+        """
+        from .when import When
+        from_epoch = When._from_epoch
+        timezone = self.timezone
+        low, high = _epoch_of(start), _epoch_of(stop)
+        # equal starts may spill over from one block into the next
+        first = bisect.bisect_left(self._firsts, low) - 1
+        first = first if first > 0 else 0
+        for i in range(first, bisect.bisect_left(self._firsts, high)):
+            starts, ends, values = self._starts[i], self._ends[i], self._values[i]
+            for position in range(bisect.bisect_left(starts, low),
+                                  bisect.bisect_left(starts, high)):
+                start, end = starts[position], ends[position]
+                yield (from_epoch(start, timezone),
+                       from_epoch(end, timezone) if end > start else None,
+                       values[position])
+
+    # container protocol
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        if self._length == 0:
+            return iter(())
+        return self.starting(self._firsts[0], self._starts[-1][-1] + 1)
+
+    def __repr__(self):
+        return '{}(<{} intervals>, timezone={!r})'.format(
+            self.__class__.__name__, self._length, self.timezone)
@@ -0,0 +1,549 @@
+# standard libraries
+import re
+import datetime
+import itertools
+import functools
+# third party libraries
+import pytz
+# first party libraries
+from . import substitutions
+from .timezones import timezones
+
+
+__all__ = ('Plan', 'Parser', 'InferringParser', 'compile', 'infer',
+           'iso_fields', 'ParsingError', )
+
+
+class ParsingError(ValueError):
+
+    pass
+
+
+def _scrub_potentials(*potentials):
+    potentials = [potential for potential in potentials if potential is not None]
+    if len(potentials) == 0:
+        return None
+    first = potentials[0]
+    if not all(first == potential for potential in potentials):
+        raise pytz.AmbiguousTimeError()
+    return first
+
+
+# substitutions made on the specifier to turn it into a regex
+_patterns = {
+    '1776': r'(?P<_1776>\d?\d?\d?\d)',
+    '76': r'(?P<_76>\d\d)',
+    'July': r'(?P<_July>January|February|March|April|May|June|July|August|September|October|November|December)',
+    'Jul': r'(?P<_Jul>Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)',
+    'America/New_York': r'(?P<timezone>Z|z|[a-zA-Z_/]+)',
+    '012345': r'(?P<_012345>\d\d\d\d\d\d)',
+    '12345': r'(?P<_12345>\d?\d?\d?\d?\d?\d)',
+    '012': r'(?P<_012>\d\d\d)',
+    '12': r'(?P<_12>\d?\d?\d)',
+    '13': r'(?P<_13>\d\d)',
+    '07': r'(?P<_07>\d\d)',
+    '04': r'(?P<_04>\d\d)',
+    '03': r'(?P<_03>\d\d)',
+    '02': r'(?P<_02>\d\d)',
+    '01': r'(?P<_01>\d\d)',
+    '7': r'(?P<_7>\d?\d)',
+    '4': r'(?P<_4>\d?\d)',
+    '3': r'(?P<_3>\d?\d)',
+    '2': r'(?P<_2>\d?\d)',
+    '1': r'(?P<_1>\d?\d)',
+    'pm': r'(?P<_pm>am|pm)',
+    'p.m.': r'(?P<_p_m_>a\.m\.|p\.m\.)',
+    'PM': r'(?P<_PM>AM|PM)',
+    'P.M.': r'(?P<_P_M_>A\.M\.|P\.M\.)',
+}
+
+
+_month_to_int = {
+    'January': 1, 'Jan': 1,
+    'February': 2, 'Feb': 2,
+    'March': 3, 'Mar': 3,
+    'April': 4, 'Apr': 4,
+    'May': 5,
+    'June': 6, 'Jun': 6,
+    'July': 7, 'Jul': 7,
+    'August': 8, 'Aug': 8,
+    'September': 9, 'Sep': 9,
+    'October': 10, 'Oct': 10,
+    'November': 11, 'Nov': 11,
+    'December': 12, 'Dec': 12,
+}
+
+
+_meridian_to_offset = {
+    'am': 0, 'pm': 12,
+    'a.m.': 0, 'p.m.': 12,
+    'AM': 0, 'PM': 12,
+    'A.M.': 0, 'P.M.': 12,
+}
+
+
+# field extractors; each is called as extract(text, century, meridian_offset),
+# where meridian_offset is None when there is no am or pm
+
+def _year_from_1776(text, century, meridian_offset):
+    year = int(text)
+    if century is not None:
+        if abs(year - century) > 100:
+            raise pytz.AmbiguousTimeError()
+    return year
+
+
+def _year_from_76(text, century, meridian_offset):
+    if century is None:
+        raise ParsingError('A century is required to parse a two-digit year.')
+    return century + int(text)
+
+
+def _month_from_name(text, century, meridian_offset):
+    return _month_to_int[text]
+
+
+def _integer(text, century, meridian_offset):
+    return int(text)
+
+
+def _twelve_hour(text, century, meridian_offset):
+    if meridian_offset is None:
+        return int(text)
+    # 12 am is midnight and 12 pm is noon
+    return meridian_offset + int(text) % 12
+
+
+def _millisecond(text, century, meridian_offset):
+    return 1000*int(text)
+
+
+def _timezone(text, century, meridian_offset):
+    if text in ('z', 'Z'):
+        return 'utc'
+    else:
+        return text
+
+
+_extractors = (
+    ('year', (('_1776', _year_from_1776), ('_76', _year_from_76), )),
+    ('month', (('_July', _month_from_name), ('_Jul', _month_from_name),
+               ('_07', _integer), ('_7', _integer), )),
+    ('day', (('_04', _integer), ('_4', _integer), )),
+    ('hour', (('_13', _integer), ('_01', _twelve_hour), ('_1', _twelve_hour), )),
+    ('minute', (('_02', _integer), ('_2', _integer), )),
+    ('second', (('_03', _integer), ('_3', _integer), )),
+    ('microsecond', (('_012', _millisecond), ('_12', _millisecond),
+                     ('_12345', _integer), ('_012345', _integer), )),
+    ('timezone', (('timezone', _timezone), )),
+)
+
+
+_meridian_groups = ('_pm', '_p_m_', '_PM', '_P_M_', )
+
+
+_regex_substitutor = substitutions.Substitutor(_patterns)
+
+
+class Plan(object):
+    """ A specifier compiled once into a regex and the extractors it needs.
+
+        Only the fields whose tokens actually appear in the specifier are
+        looked at when a string is parsed.
+
+        >>> plan = Plan('1776-07-04 1:02 pm')
+        >>> plan.fields('2015-03-03 2:58 pm') == {'year': 2015, 'month': 3,
+        ...     'day': 3, 'hour': 14, 'minute': 58}
+        True
+        >>> [field for field, extractors in plan.extractors]
+        ['year', 'month', 'day', 'hour', 'minute']
+        >>> plan.fields('yesterday')
+        Traceback (most recent call last):
+        ...
+        when.parsing.ParsingError: 'yesterday' does not match specifier '1776-07-04 1:02 pm'.
+
+    """
+    def __init__(self, specifier):
+        self.specifier = specifier
+        self.regex = re.compile(_regex_substitutor(specifier))
+        present = self.regex.groupindex
+        extractors = []
+        for field, candidates in _extractors:
+            candidates = tuple((group, extract) for group, extract in candidates
+                               if group in present)
+            if len(candidates) > 0:
+                extractors.append((field, candidates))
+        self.extractors = tuple(extractors)
+        self.meridian_groups = tuple(group for group in _meridian_groups
+                                     if group in present)
+
+    def match(self, string):
+        match = self.regex.match(string)
+        if match is None:
+            error = '{!r} does not match specifier {!r}.'
+            raise ParsingError(error.format(string, self.specifier))
+        return match
+
+    def fields(self, string, century=None):
+        """ Parse ```string``` into a dict holding every field that matched.
+
+        """
+        return self.fields_from_match(self.match(string), century)
+
+    def fields_from_match(self, match, century=None):
+        group = match.group
+        meridian_offset = None
+        if self.meridian_groups:
+            meridian_offset = _scrub_potentials(*(
+                _meridian_to_offset.get(group(name)) for name in self.meridian_groups
+            ))
+        fields = {}
+        for field, candidates in self.extractors:
+            potentials = []
+            for name, extract in candidates:
+                text = group(name)
+                if text is not None:
+                    potentials.append(extract(text, century, meridian_offset))
+            value = _scrub_potentials(*potentials)
+            if value is not None:
+                fields[field] = value
+        return fields
+
+    def __repr__(self):
+        return '{}({!r})'.format(self.__class__.__name__, self.specifier)
+
+
+@functools.lru_cache(maxsize=256)
+def compile(specifier):
+    """ Return the (cached) Plan for ```specifier```.
+
+        The most recently used plans are kept in a bounded LRU cache, so
+        parsing many strings with the same specifier only builds the regex
+        once.
+
+        >>> compile('1776-07-04') is compile('1776-07-04')
+        True
+
+    """
+    return Plan(specifier)
+
+
+# the specifiers ```infer``` tries, in order; when the samples can't tell two
+# apart (eg 03/04/2015), the earlier one wins, so month-first dates are
+# preferred to day-first ones
+_candidates = (
+    '1776-07-04T13:02:03.012345America/New_York',
+    '1776-07-04T13:02:03.012America/New_York',
+    '1776-07-04T13:02:03America/New_York',
+    '1776-07-04T13:02:03.012345',
+    '1776-07-04T13:02:03.012',
+    '1776-07-04T13:02:03',
+    '1776-07-04T13:02',
+    '1776-07-04 13:02:03.012345America/New_York',
+    '1776-07-04 13:02:03.012America/New_York',
+    '1776-07-04 13:02:03America/New_York',
+    '1776-07-04 13:02:03 America/New_York',
+    '1776-07-04 13:02:03.012345',
+    '1776-07-04 13:02:03.012',
+    '1776-07-04 13:02:03',
+    '1776-07-04 13:02',
+    '1776-07-04',
+    '17760704T130203America/New_York',
+    '17760704T130203',
+    '17760704',
+    '1776/07/04 13:02:03',
+    '1776/07/04',
+    '7/4/1776 1:02:03 pm',
+    '7/4/1776 1:02:03 PM',
+    '7/4/1776 1:02 pm',
+    '7/4/1776 1:02 PM',
+    '7/4/1776 13:02:03',
+    '7/4/1776 13:02',
+    '7/4/1776',
+    '4/7/1776 13:02:03',
+    '4/7/1776 13:02',
+    '4/7/1776',
+    '4.7.1776 13:02:03',
+    '4.7.1776 13:02',
+    '4.7.1776',
+    'July 4, 1776 1:02:03 pm',
+    'July 4, 1776 1:02 pm',
+    'July 4, 1776',
+    'Jul 4, 1776 1:02:03 pm',
+    'Jul 4, 1776 1:02 pm',
+    'Jul 4, 1776',
+    '4 July 1776',
+    '4 Jul 1776 13:02:03',
+    '4 Jul 1776',
+)
+
+
+def _plausible(plan, match):
+    # whether a full match also holds a real date, time and timezone
+    try:
+        fields = plan.fields_from_match(match)
+        datetime.datetime(fields.get('year', 1776), fields.get('month', 1),
+                          fields.get('day', 1), fields.get('hour', 0),
+                          fields.get('minute', 0), fields.get('second', 0),
+                          fields.get('microsecond', 0))
+    except (TypeError, ValueError, pytz.InvalidTimeError):
+        return False
+    timezone = fields.get('timezone')
+    return timezone is None or timezone in timezones
+
+
+def infer(samples, candidates=None):
+    """ Return the first of ```candidates``` (by default, a list of common
+        date and time layouts) that fully matches every one of ```samples```
+        with a valid date and time.
+
+        >>> infer(['2015-03-03 02:58:59', '2015-12-31 23:00:00'])
+        '1776-07-04 13:02:03'
+        >>> infer(['03/04/2015', '04/05/2015'])
+        '7/4/1776'
+        >>> infer(['03/04/2015', '13/04/2015'])
+        '4/7/1776'
+        >>> infer(['yesterday'])
+        Traceback (most recent call last):
+        ...
+        when.parsing.ParsingError: No candidate specifier matches 'yesterday'.
+
+    """
+    samples = list(samples)
+    if len(samples) == 0:
+        raise ParsingError('At least one sample is needed to infer a specifier.')
+    for specifier in (_candidates if candidates is None else candidates):
+        plan = compile(specifier)
+        fullmatch = plan.regex.fullmatch
+        for sample in samples:
+            match = fullmatch(sample)
+            if match is None or not _plausible(plan, match):
+                break
+        else:
+            return specifier
+    if len(samples) == 1:
+        raise ParsingError('No candidate specifier matches {!r}.'.format(samples[0]))
+    raise ParsingError('No candidate specifier matches all of the samples.')
+
+
+_iso_regex = re.compile(r"""
+    (?P<year>\d\d\d\d)-?(?P<month>\d\d)-?(?P<day>\d\d)
+    (?:[Tt\ ]
+        (?P<hour>\d\d)
+        (?::?(?P<minute>\d\d)
+            (?::?(?P<second>\d\d)
+                (?:[.,](?P<fraction>\d+))?
+            )?
+        )?
+    )?
+    (?:(?P<utc>[Zz])|(?P<sign>[+-])(?P<offset_hour>\d\d)(?::?(?P<offset_minute>\d\d))?)?
+    \Z""", re.VERBOSE)
+
+
+def iso_fields(string):
+    """ Parse an ISO-8601 or RFC 3339 string in a single pass.
+    
+        Both the basic and extended forms are understood, with optional 
+        fractional seconds (truncated to microseconds) and an optional ```Z``` 
+        or numeric UTC offset.  Returns a ```(fields, offset)``` tuple, where 
+        ```offset``` is the numeric UTC offset in minutes (or None), and 
+        returns None rather than raising when the string is not in one of 
+        these forms.
+        
+        >>> fields, offset = iso_fields('2015-03-03T02:00:59.1234567+05:30')
+        >>> sorted(fields.items()), offset
+        ([('day', 3), ('hour', 2), ('microsecond', 123456), ('minute', 0), ('month', 3), ('second', 59), ('year', 2015)], 330)
+        >>> iso_fields('20150303T0200Z')[0]['timezone']
+        'utc'
+        >>> iso_fields('2015-062') is None
+        True
+        
+    """
+    match = _iso_regex.match(string)
+    if match is None:
+        return None
+    year, month, day, hour, minute, second, fraction, utc, sign, \
+        offset_hour, offset_minute = match.groups()
+    fields = {'year': int(year), 'month': int(month), 'day': int(day)}
+    if hour is not None:
+        fields['hour'] = int(hour)
+        fields['minute'] = 0 if minute is None else int(minute)
+        fields['second'] = 0 if second is None else int(second)
+        fields['microsecond'] = 0 if fraction is None else int(fraction[:6].ljust(6, '0'))
+    offset = None
+    if utc is not None:
+        fields['timezone'] = 'utc'
+    elif sign is not None:
+        offset = 60*int(offset_hour) + int(offset_minute or 0)
+        if sign == '-':
+            offset = -offset
+    return fields, offset
+
+
+class Parser(object):
+    """ A reusable parser that builds instances of ```cls``` from strings that
+        all follow the same specifier.
+
+        Parsers are normally obtained from ```When.compile_parser```.
+
+    """
+    def __init__(self, cls, plan):
+        self.cls = cls
+        self.plan = plan
+
+    @property
+    def specifier(self):
+        return self.plan.specifier
+
+    @staticmethod
+    def _defaults(year=None, month=None, day=None, hour=0, minute=0, second=0,
+                  millisecond=0, microsecond=0, meridian=None, timezone=None,
+                  dst_if_ambiguous=None):
+        # pre-processing
+        if millisecond is not None and microsecond is None:
+            microsecond = 1000*millisecond
+        elif millisecond is not None and microsecond is not None:
+            if 1000*millisecond != microsecond:
+                raise pytz.AmbiguousTimeError()
+        return {
+            'year': year,
+            'month': month,
+            'day': day,
+            'hour': hour,
+            'minute': minute,
+            'second': second,
+            'microsecond': microsecond,
+            'timezone': timezone,
+            'dst_if_ambiguous': dst_if_ambiguous,
+        }
+
+    def __call__(self, string, century=None, **defaults):
+        kwargs = self._defaults(**defaults)
+        kwargs.update(self.plan.fields(string, century))
+        return self.cls(**kwargs)
+
+    def many(self, strings, errors='raise', sentinel=None, century=None,
+             **defaults):
+        """ Lazily parse an iterable of strings.
+
+            Strings that do not match are handled according to ```errors```:
+            ```'raise'``` raises a ParsingError, ```'skip'``` drops the string
+            and ```'sentinel'``` yields ```sentinel``` in its place.  Strings
+            that do not match the specifier are detected without raising an
+            exception.
+
+        """
+        if errors not in ('raise', 'skip', 'sentinel'):
+            raise ValueError("errors must be one of 'raise', 'skip' or 'sentinel'.")
+        kwargs = self._defaults(**defaults)
+        timezone = kwargs['timezone']
+        if timezone is not None and timezone not in timezones:
+            raise ValueError('You must supply a valid timezone.')
+        return self._many(strings, errors, sentinel, century, kwargs)
+
+    def _many(self, strings, errors, sentinel, century, defaults):
+        cls = self.cls
+        match = self.plan.regex.match
+        fields_from_match = self.plan.fields_from_match
+        for string in strings:
+            try:
+                matched = match(string)
+                if matched is not None:
+                    kwargs = defaults.copy()
+                    kwargs.update(fields_from_match(matched, century))
+                    when = cls(**kwargs)
+                else:
+                    when = None
+                    error = '{!r} does not match specifier {!r}.'
+                    error = ParsingError(error.format(string, self.specifier))
+            except (TypeError, ValueError, pytz.InvalidTimeError) as exception:
+                when = None
+                error = exception
+            if when is not None:
+                yield when
+            elif errors == 'raise':
+                raise error
+            elif errors == 'sentinel':
+                yield sentinel
+
+    def __repr__(self):
+        return '{}({}, {!r})'.format(self.__class__.__name__,
+                                     self.cls.__name__, self.specifier)
+
+
+class InferringParser(Parser):
+    """ A Parser for strings whose specifier isn't known in advance.
+
+        The specifier is inferred from the first ```samples``` strings, and
+        every later string is parsed with the compiled plan locked onto, at
+        the same cost as with a known specifier.  Inference is only run again
+        when a string doesn't fully match the plan (or gives an invalid date),
+        in which case the parser locks onto whatever fits that string.
+
+        >>> from .when import When
+        >>> parser = InferringParser(When)
+        >>> rows = ['2015-03-03 02:58:59', '2015-03-04 02:58:59', '03/05/2015']
+        >>> [str(when) for when in parser.many(rows, timezone='utc')]
+        ['2015-03-03 02:58:59+00:00', '2015-03-04 02:58:59+00:00', '2015-03-05 00:00:00+00:00']
+        >>> parser.specifier
+        '7/4/1776'
+
+    """
+    def __init__(self, cls, candidates=None, samples=8):
+        Parser.__init__(self, cls, None)
+        self.candidates = candidates
+        self.samples = samples
+
+    @property
+    def specifier(self):
+        return None if self.plan is None else self.plan.specifier
+
+    def _lock(self, strings):
+        self.plan = compile(infer(strings, self.candidates))
+        return self.plan
+
+    def __call__(self, string, century=None, **defaults):
+        if self.plan is None or self.plan.regex.fullmatch(string) is None:
+            self._lock([string])
+        return Parser.__call__(self, string, century, **defaults)
+
+    def _build(self, plan, string, century, defaults):
+        if plan is None:
+            raise ParsingError('No specifier has been inferred yet.')
+        match = plan.regex.fullmatch(string)
+        if match is None:
+            error = '{!r} does not match specifier {!r}.'
+            raise ParsingError(error.format(string, plan.specifier))
+        kwargs = defaults.copy()
+        kwargs.update(plan.fields_from_match(match, century))
+        return self.cls(**kwargs)
+
+    def _many(self, strings, errors, sentinel, century, defaults):
+        strings = iter(strings)
+        head = list(itertools.islice(strings, self.samples))
+        if self.plan is None and len(head) > 0:
+            try:
+                self._lock(head)
+            except ParsingError:
+                # the head is mixed (or has bad rows); infer row by row
+                pass
+        for string in itertools.chain(head, strings):
+            try:
+                when = self._build(self.plan, string, century, defaults)
+            except (TypeError, ValueError, pytz.InvalidTimeError):
+                try:
+                    plan = compile(infer([string], self.candidates))
+                    when = self._build(plan, string, century, defaults)
+                    self.plan = plan
+                except (TypeError, ValueError, pytz.InvalidTimeError) as exception:
+                    when = None
+                    error = exception
+            if when is not None:
+                yield when
+            elif errors == 'raise':
+                raise error
+            elif errors == 'sentinel':
+                yield sentinel
+
+    def __repr__(self):
+        return '{}({})'.format(self.__class__.__name__, self.cls.__name__)
@@ -0,0 +1,314 @@
+# standard libraries
+import asyncio
+import threading
+# third party libraries
+pass
+# first party libraries
+from . import clocks
+
+
+__all__ = ('TimingWheel', 'Handle', )
+
+
+def _epoch_of(instant):
+    # Whens are scheduled by their epoch microseconds; ints are taken as is
+    try:
+        return instant._epoch
+    except AttributeError:
+        return int(instant)
+
+
+def _microseconds(duration):
+    # While, timedelta or a number of seconds as integer microseconds
+    try:
+        return duration._microseconds
+    except AttributeError:
+        pass
+    try:
+        seconds = duration.total_seconds()
+    except AttributeError:
+        seconds = duration
+    return int(round(1000000*seconds))
+
+
+class Handle(object):
+    """ A scheduled callback, which ```cancel``` removes in constant time.
+
+    """
+    __slots__ = ('when', 'tick', 'callback', 'args', '_slot', '_lock', )
+
+    def __init__(self, when, tick, callback, args, lock):
+        self.when = when
+        self.tick = tick
+        self.callback = callback
+        self.args = args
+        self._slot = None
+        self._lock = lock
+
+    @property
+    def cancelled(self):
+        return self._slot is None
+
+    def cancel(self):
+        with self._lock:
+            slot, self._slot = self._slot, None
+            if slot is not None:
+                del slot[self]
+
+    def __repr__(self):
+        return '{}({!r}, {!r})'.format(self.__class__.__name__, self.when,
+                                       self.callback)
+
+
+class TimingWheel(object):
+    """ A hierarchical timing wheel of callbacks keyed by When deadlines.
+
+        Deadlines are rounded up to ticks of ```resolution``` (a While,
+        timedelta or number of seconds) since the epoch.  The innermost wheel
+        has a slot per tick; each outer wheel has a slot per turn of the wheel
+        inside it, and its slots are cascaded inwards as time reaches them.
+        Scheduling and cancelling are a few integer operations and a dict
+        insert or delete, whatever the number of pending callbacks, and
+        advancing skips straight over empty slots.
+
+        Callbacks are called as ```callback(when, *args)``` with the When they
+        were scheduled for, once the clock (by default the one behind
+        ```When.now```, see ```when.clocks```) has reached it.  ```advance```
+        fires whatever is due; ```run``` and ```run_async``` are blocking and
+        asyncio drivers that sleep until the next deadline.  The wheel is
+        guarded by a lock, so callbacks may be scheduled and cancelled from
+        any thread; callbacks themselves are called without holding it.
+
+        >>> from .when import When
+        >>> from .while_ import While
+        >>> clock = clocks.ManualClock(When(2015, 4, 22, timezone='utc'))
+        >>> wheel = TimingWheel(clock=clock)
+        >>> fired = []
+        >>> def remember(when, name):
+        ...     fired.append((name, str(when)))
+        >>> later = wheel.call_later(While(hours=1), remember, 'later')
+        >>> sooner = wheel.call_later(While(seconds=1), remember, 'sooner')
+        >>> doomed = wheel.call_later(While(minutes=1), remember, 'doomed')
+        >>> doomed.cancel()
+        >>> clock.advance(While(days=1))
+        >>> wheel.advance()
+        2
+        >>> fired
+        [('sooner', '2015-04-22 00:00:01+00:00'), ('later', '2015-04-22 01:00:00+00:00')]
+        >>> len(wheel)
+        0
+
+        Deadlines scheduled by other threads while the wheel is advanced are
+        neither lost nor left behind.
+
+        >>> wheel, fired = TimingWheel(clock=clock), []
+        >>> def produce():
+        ...     for _ in range(2000):
+        ...         wheel.call_later(0, fired.append)
+        >>> producers = [threading.Thread(target=produce) for _ in range(4)]
+        >>> for producer in producers:
+        ...     producer.start()
+        >>> while any(producer.is_alive() for producer in producers):
+        ...     clock.advance(0.001)
+        ...     _ = wheel.advance()
+        >>> for producer in producers:
+        ...     producer.join()
+        >>> clock.advance(0.001)
+        >>> _ = wheel.advance()
+        >>> len(fired), len(wheel)
+        (8000, 0)
+
+    """
+    def __init__(self, resolution=0.001, clock=None, bits=6, levels=6):
+        self.resolution = _microseconds(resolution)
+        if self.resolution <= 0:
+            raise ValueError('The resolution must be positive.')
+        self._clock = clock
+        self._bits = bits
+        self._mask = (1 << bits) - 1
+        self._wheels = [[{} for _ in range(1 << bits)] for _ in range(levels)]
+        # deadlines beyond the outermost wheel, revisited as it turns
+        self._overflow = {}
+        self._due = {}
+        self._tick = self._now()//self.resolution
+        self._wake = None
+        self._lock = threading.Lock()
+
+    def _now(self):
+        clock = self._clock if self._clock is not None else clocks.get_clock()
+        return clock.epoch()
+
+    def __len__(self):
+        with self._lock:
+            return (sum(len(slot) for wheel in self._wheels for slot in wheel) +
+                    len(self._overflow) + len(self._due))
+
+    # scheduling
+
+    def schedule(self, when, callback, *args):
+        """ Call ```callback(when, *args)``` once ```when``` has come.
+
+        """
+        try:
+            epoch = when._epoch
+        except AttributeError:
+            from .when import When
+            epoch = int(when)
+            when = When._from_epoch(epoch, 'utc')
+        handle = Handle(when, -(-epoch//self.resolution), callback, args,
+                        self._lock)
+        with self._lock:
+            self._place(handle)
+        if self._wake is not None:
+            self._wake()
+        return handle
+
+    def call_later(self, delay, callback, *args):
+        """ Schedule ```callback``` for ```delay``` (a While, timedelta or a
+            number of seconds) from now.
+
+        """
+        from .when import When
+        when = When._from_epoch(self._now() + _microseconds(delay), 'utc')
+        return self.schedule(when, callback, *args)
+
+    def cancel(self, handle):
+        handle.cancel()
+
+    def _place(self, handle):
+        tick, current = handle.tick, self._tick
+        if tick <= current:
+            slot = self._due
+        else:
+            # the innermost wheel that still shares its turn with the deadline
+            # is the one holding the highest bit in which the two differ
+            level = ((tick ^ current).bit_length() - 1)//self._bits
+            if level < len(self._wheels):
+                slot = self._wheels[level][(tick >> (self._bits*level)) & self._mask]
+            else:
+                slot = self._overflow
+        slot[handle] = None
+        handle._slot = slot
+
+    # advancing
+
+    def _next_tick(self):
+        # the next tick after the current one at which a slot needs visiting
+        current, bits, mask = self._tick, self._bits, self._mask
+        for level, wheel in enumerate(self._wheels):
+            shift = bits*level
+            turn = (current >> (shift + bits)) << (shift + bits)
+            for index in range(((current >> shift) & mask) + 1, mask + 1):
+                if wheel[index]:
+                    return turn + (index << shift)
+        if self._overflow:
+            # straight to the turn of the outermost wheel holding the earliest
+            # overflowed deadline, rather than through every turn before it
+            shift = bits*len(self._wheels)
+            earliest = min(handle.tick for handle in self._overflow) >> shift
+            return max(earliest, (current >> shift) + 1) << shift
+        return None
+
+    def _visit(self, tick, fired):
+        self._tick = tick
+        bits, mask = self._bits, self._mask
+        if tick & mask == 0:
+            reinsert = []
+            if tick & ((1 << (bits*len(self._wheels))) - 1) == 0:
+                reinsert.extend(self._overflow)
+                self._overflow.clear()
+            # cascade outer slots whose turn starts now, outermost first
+            for level in range(len(self._wheels) - 1, 0, -1):
+                if tick & ((1 << (bits*level)) - 1) == 0:
+                    slot = self._wheels[level][(tick >> (bits*level)) & mask]
+                    reinsert.extend(slot)
+                    slot.clear()
+            for handle in reinsert:
+                self._place(handle)
+        # cascading lands deadlines of this very tick in the due slot
+        for slot in (self._wheels[0][tick & mask], self._due):
+            if slot:
+                fired.extend(slot)
+                for handle in slot:
+                    handle._slot = None
+                slot.clear()
+
+    def advance(self, when=None):
+        """ Fire every callback due by ```when``` (by default, now), in order
+            of their deadlines, and return how many were fired.
+
+        """
+        target = (self._now() if when is None else _epoch_of(when))//self.resolution
+        fired = []
+        with self._lock:
+            if self._due:
+                fired.extend(self._due)
+                for handle in self._due:
+                    handle._slot = None
+                self._due.clear()
+            while True:
+                tick = self._next_tick()
+                if tick is None or tick > target:
+                    break
+                self._visit(tick, fired)
+            if target > self._tick:
+                self._tick = target
+        fired.sort(key=lambda handle: handle.tick)
+        for handle in fired:
+            handle.callback(handle.when, *handle.args)
+        return len(fired)
+
+    def _seconds_to_next(self):
+        with self._lock:
+            if self._due:
+                return 0.0
+            tick = self._next_tick()
+        if tick is None:
+            return None
+        return max(0.0, (tick*self.resolution - self._now())/1000000.0)
+
+    # drivers
+
+    def run(self, until_empty=True):
+        """ Fire callbacks as they fall due, sleeping in between, until none
+            are left (or forever, if ```until_empty``` is False).
+
+            Callbacks may be scheduled from other threads while this runs;
+            each one wakes the driver, in case it is due sooner.
+
+        """
+        woken = threading.Event()
+        self._wake = woken.set
+        try:
+            while True:
+                # cleared first, so a deadline scheduled while advancing
+                # still cuts the wait short
+                woken.clear()
+                self.advance()
+                if until_empty and len(self) == 0:
+                    return
+                woken.wait(self._seconds_to_next())
+        finally:
+            self._wake = None
+
+    async def run_async(self, until_empty=True):
+        """ The asyncio counterpart of ```run```; callbacks should be
+            scheduled from the event loop's thread while it runs.
+
+        """
+        woken = asyncio.Event()
+        self._wake = woken.set
+        try:
+            while True:
+                # cleared first, so a deadline scheduled while advancing
+                # still cuts the wait short
+                woken.clear()
+                self.advance()
+                if until_empty and len(self) == 0:
+                    return
+                try:
+                    await asyncio.wait_for(woken.wait(), self._seconds_to_next())
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._wake = None
@@ -0,0 +1,225 @@
+# standard libraries
+import os
+import mmap
+# third party libraries
+pass
+# first party libraries
+from . import binary
+from .timezones import timezones
+
+
+__all__ = ('TimeSeriesFile', )
+
+
+_record = binary.while_struct.size
+# the column as it is on disk, whatever the byte order of this machine
+_dtype = '<i8'
+
+
+def _epoch_of(instant):
+    # Whens are stored as their epoch microseconds; ints are taken as is
+    try:
+        return instant._epoch
+    except AttributeError:
+        return int(instant)
+
+
+class TimeSeriesFile(object):
+    """ An append-only file of instants stored as a sorted column of
+        little-endian int64 epoch microseconds.
+
+        Reads go through a memory map of the file, viewed as a little-endian
+        NumPy column whatever the byte order of the machine (so reading
+        requires NumPy), and range queries are a binary search over the
+        mapped column that return zero-copy slices of it; nothing is parsed
+        and the file is never loaded as a whole.  Instants must be appended
+        in non-decreasing order.
+
+        Appends are buffered and written with a single ```os.write```, and the
+        file is ```fsync```-ed every ```sync_every``` records (and on
+        ```sync``` or ```close```).  Records are a fixed eight bytes, so a
+        write cut short by a crash leaves at most a partial record at the end
+        of the file, which is truncated away when the file is next opened.
+
+        >>> import os, tempfile
+        >>> from .when import When
+        >>> path = os.path.join(tempfile.mkdtemp(), 'events')
+        >>> with TimeSeriesFile(path, timezone='America/New_York') as series:
+        ...     series.extend(When(2015, 4, day, timezone='utc') for
+        ...                   day in range(1, 31))
+        >>> series = TimeSeriesFile(path, timezone='America/New_York')
+        >>> len(series)
+        30
+        >>> series[0]
+        When(2015, 3, 31, 20, 0, 0, 0, 'America/New_York', True)
+        >>> hits = series.between(When(2015, 4, 10, timezone='utc'),
+        ...                       When(2015, 4, 13, timezone='utc'))
+        >>> hits.to_whens() == [series[9], series[10], series[11]]
+        True
+        >>> series.append(When(2015, 1, 1, timezone='utc'))
+        Traceback (most recent call last):
+        ...
+        ValueError: Instants must be appended in non-decreasing order.
+        >>> series.close()
+
+        Reopening a file appends after the records already in it, including
+        when a torn record had to be dropped first.
+
+        >>> with TimeSeriesFile(path) as series:
+        ...     series.append(When(2015, 5, 1, timezone='utc'))
+        >>> with open(path, 'ab') as f:
+        ...     f.write(b'torn')
+        4
+        >>> with TimeSeriesFile(path) as series:
+        ...     series.append(When(2015, 5, 2, timezone='utc'))
+        >>> series = TimeSeriesFile(path)
+        >>> len(series), series[0], series[-2], series[-1]
+        (32, When(2015, 4, 1, 0, 0, 0, 0, 'utc', False), When(2015, 5, 1, 0, 0, 0, 0, 'utc', False), When(2015, 5, 2, 0, 0, 0, 0, 'utc', False))
+        >>> series.close()
+
+    """
+    def __init__(self, path, timezone='utc', sync_every=1024):
+        if timezone not in timezones:
+            raise ValueError('You must supply a valid timezone.')
+        self.path = path
+        self.timezone = timezone
+        self.sync_every = sync_every
+        # every write goes to the end of the file, after whatever was there
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        size = os.fstat(self._fd).st_size
+        if size % _record:
+            # a torn write from a crash; drop the partial record
+            size -= size % _record
+            os.ftruncate(self._fd, size)
+            os.fsync(self._fd)
+        self._written = size // _record
+        self._pending = bytearray()
+        self._unsynced = 0
+        self._map = None
+        self._column = None
+        self._last = None
+        if self._written > 0:
+            self._last = int(self._epochs()[self._written - 1])
+
+    # writing
+
+    def append(self, instant):
+        """ Append a When (or integer epoch microseconds) to the file.
+
+        """
+        epoch = _epoch_of(instant)
+        if self._last is not None and epoch < self._last:
+            raise ValueError('Instants must be appended in non-decreasing order.')
+        self._pending += binary.while_struct.pack(epoch)
+        self._last = epoch
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every:
+            self.sync()
+
+    def extend(self, instants):
+        for instant in instants:
+            self.append(instant)
+
+    def _write(self):
+        # hand buffered records to the OS; they are durable once synced
+        pending = self._pending
+        written = 0
+        while written < len(pending):
+            written += os.write(self._fd, pending[written:])
+        self._written += len(pending) // _record
+        self._pending = bytearray()
+
+    def sync(self):
+        """ Write any buffered records and ```fsync``` the file.
+
+        """
+        self._write()
+        os.fsync(self._fd)
+        self._unsynced = 0
+
+    def close(self):
+        if self._fd is None:
+            return
+        self.sync()
+        os.close(self._fd)
+        self._fd = None
+        self._column = None
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # slices handed out still reference the map; let them keep it
+                pass
+            self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    # reading
+
+    def _epochs(self):
+        """ The whole column as a read-only little-endian int64 array,
+            remapped if it grew.
+
+        """
+        import numpy
+        if self._pending:
+            self._write()
+        if self._column is None or len(self._column) != self._written:
+            if self._written == 0:
+                return numpy.zeros(0, dtype=_dtype)
+            # the old map is left to the slices that may still reference it
+            self._map = mmap.mmap(self._fd, self._written*_record,
+                                  access=mmap.ACCESS_READ)
+            self._column = numpy.frombuffer(self._map, dtype=_dtype)
+        return self._column
+
+    def __len__(self):
+        return self._written + len(self._pending) // _record
+
+    def __getitem__(self, index):
+        from .when import When
+        return When._from_epoch(int(self._epochs()[index]), self.timezone)
+
+    def __iter__(self):
+        from .when import When
+        from_epoch = When._from_epoch
+        timezone = self.timezone
+        column = self._epochs()
+        # converted a chunk at a time, so the file is never copied as a whole
+        for start in range(0, len(column), 4096):
+            for epoch in column[start:start + 4096].tolist():
+                yield from_epoch(epoch, timezone)
+
+    def bounds(self, start=None, stop=None):
+        """ The record indices spanning the instants in ```[start, stop)```.
+
+        """
+        column = self._epochs()
+        first = 0 if start is None else int(column.searchsorted(_epoch_of(start)))
+        last = len(column) if stop is None else \
+            first + int(column[first:].searchsorted(_epoch_of(stop)))
+        return first, last
+
+    def epochs(self, start=None, stop=None):
+        """ The epoch microseconds in ```[start, stop)``` as a zero-copy
+            little-endian int64 array over the mapped file.
+
+        """
+        first, last = self.bounds(start, stop)
+        return self._epochs()[first:last]
+
+    def between(self, start=None, stop=None):
+        """ The instants in ```[start, stop)``` as a WhenArray sharing memory
+            with the mapped file.
+
+        """
+        from .arrays import WhenArray
+        return WhenArray._from_epochs(self.epochs(start, stop), self.timezone)
+
+    def __repr__(self):
+        return '{}({!r}, timezone={!r})'.format(self.__class__.__name__,
+                                                self.path, self.timezone)
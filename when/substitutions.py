@@ -1,39 +1,120 @@
 # standard libraries
 import re
+import functools
 # third party libraries
 pass
 # first party libraries
 pass
 
 
+# marks the node at which a key ends; no key contains an empty character
+_key = ''
+
+
+def _trie(keys):
+    # nested dicts from a character to the next node; the node at which a key
+    # ends also maps ```_key``` to the key itself
+    trie = {}
+    for key in keys:
+        if len(key) == 0:
+            continue
+        node = trie
+        for character in key:
+            node = node.setdefault(character, {})
+        node[_key] = key
+    return trie
+
+
+def _pattern(node):
+    # the trie as a regex that shares every common prefix, so the regex engine
+    # follows one path through it instead of trying each key in turn; optional
+    # groups are greedy, so the longest key wins, as when keys are alternated
+    # longest first
+    branches = [re.escape(character) + _pattern(child) for character, child
+                in sorted(node.items()) if character != _key]
+    if len(branches) == 0:
+        return ''
+    if _key in node:
+        return '(?:{})?'.format('|'.join(branches))
+    if len(branches) == 1:
+        return branches[0]
+    return '(?:{})'.format('|'.join(branches))
+
+
+@functools.lru_cache(maxsize=256)
+def _compile(keys):
+    """ Return the (cached) splitter for ```keys```, a frozenset of strings.
+
+        Splitting a string gives literal text at even and keys at odd indices.
+
+    """
+    trie = _trie(keys)
+    pattern = _pattern(trie) if len(trie) > 0 else '(?!)'
+    return re.compile('({})'.format(pattern)).split
+
+
+def _scan(split, string):
+    return tuple((text, index & 1 == 1) for index, text in
+                 enumerate(split(string)) if len(text) > 0)
+
+
 class Substitutor(object):
     """ Performs efficient one-pass multiple string substitution.
-    
+
+        Keys are matched through a trie of their characters, compiled once for
+        every Substitutor with the same keys, and each string is only scanned
+        once: its tokens are cached, so substituting the same template again
+        just splices in the values.  Values are looked up when substituting, so
+        they may change between calls.
+
         >>> string = 'foo is bar, and bar is foo'
         >>> substitutions = {'foo': 'bar', 'bar': 'foo', 'and': 'or'}
         >>> substitutor = Substitutor(substitutions)
         >>> substitutor(string)
         'bar is foo, or foo is bar'
-        
+        >>> substitutions['and'] = 'nor'
+        >>> substitutor(string)
+        'bar is foo, nor foo is bar'
+
     """
     def __init__(self, substitutions):
         self._substitutions = substitutions
-        tokens_to_replace = sorted(substitutions, key=lambda key: (len(key), key), reverse=True)
-        self._regex = re.compile('|'.join(re.escape(token) for token in tokens_to_replace))
-    
-    def _lookup(self, match):
-        return self._substitutions[match.group(0)]
-    
+        self._split = _compile(frozenset(substitutions))
+        self._pieces = functools.lru_cache(maxsize=256)(self._scan)
+
+    def _scan(self, string):
+        return _scan(self._split, string)
+
     def __call__(self, string):
-        return self._regex.sub(self._lookup, string)
+        substitutions = self._substitutions
+        return ''.join([substitutions[text] if is_token else text
+                        for text, is_token in self._pieces(string)])
+
+    def tokenize(self, string):
+        """ Split a string into literal text and the tokens to be substituted.
+
+            Each piece is returned as a ```(text, is_token)``` tuple, using the
+            same longest-match-first rules as substitution.
+
+            >>> substitutor = Substitutor({'foo': 'bar', 'fo': 'of'})
+            >>> substitutor.tokenize('a foo, fo')
+            [('a ', False), ('foo', True), (', ', False), ('fo', True)]
+
+        """
+        return list(self._pieces(string))
 
 
 def in_string(string, substitutions):
     """ Performs efficient one-pass multiple string substitution.
-        
-        Simple wrapper around StringSubstitutor (doesn't cache substitution 
-        regex).
-        
+
+        A Substitutor without the cache of scanned strings: the matcher for
+        the keys of ```substitutions``` is cached, so only ```string``` is
+        scanned from call to call.
+
+        >>> in_string('a foo, fo', {'foo': 'bar', 'fo': 'of'})
+        'a bar, of'
+
     """
-    substitutor = Substitutor(substitutions)
-    return substitutor(string)
+    parts = _compile(frozenset(substitutions))(string)
+    parts[1::2] = [substitutions[key] for key in parts[1::2]]
+    return ''.join(parts)
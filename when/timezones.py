@@ -1,19 +1,19 @@
 # standard libraries
-import collections
+import collections.abc
 # third party libraries
 import pytz
 # first party libraries
 pass
 
 
-class CaseInsensitiveDict(collections.MutableMapping):
+class CaseInsensitiveDict(collections.abc.MutableMapping):
     """ A case-insensitive ``dict``-like object.
     
     NB: this implementation is shamelessly copied from Kenneth Reitz's 
         ``requests`` library.
     
     Implements all methods and operations of
-    ``collections.MutableMapping`` as well as dict's ``copy``. Also
+    ``collections.abc.MutableMapping`` as well as dict's ``copy``. Also
     provides ``lower_items``.
     
     All keys are expected to be strings. The structure remembers the
@@ -67,7 +67,7 @@ class CaseInsensitiveDict(collections.MutableMapping):
         )
 
     def __eq__(self, other):
-        if isinstance(other, collections.Mapping):
+        if isinstance(other, collections.abc.Mapping):
             other = CaseInsensitiveDict(other)
         else:
             return NotImplemented
@@ -85,7 +85,74 @@ class CaseInsensitiveDict(collections.MutableMapping):
 utc = UTC = pytz.utc
 
 
-timezones = CaseInsensitiveDict()
-for name in pytz.all_timezones:
-    timezones[name] = pytz.timezone(name)
-    timezones[name].name = name
+class Timezones(collections.abc.Mapping):
+    """ A lazy, case-insensitive registry of every pytz timezone.
+    
+        Nothing is loaded when the registry is constructed.  The table of 
+        zone names is read the first time a name is looked up or tested for 
+        membership, and each zone is only built by pytz the first time it is 
+        retrieved.  Lookups and membership tests are case insensitive, and 
+        every zone is tagged with its canonical name::
+        
+        >>> registry = Timezones()
+        >>> 'america/new_york' in registry
+        True
+        >>> registry['america/new_york'].name
+        'America/New_York'
+        >>> registry['America/New_York'] is registry['AMERICA/NEW_YORK']
+        True
+        >>> 'America/Atlantis' in registry
+        False
+        >>> len(registry) == len(pytz.all_timezones)
+        True
+        
+    """
+    def __init__(self):
+        self._names = None
+        self._loaded = {}
+
+    def _canonical_names(self):
+        if self._names is None:
+            self._names = {name.lower(): name for name in pytz.all_timezones}
+        return self._names
+
+    def __getitem__(self, name):
+        try:
+            return self._loaded[name]
+        except KeyError:
+            pass
+        except TypeError:
+            raise KeyError(name)
+        try:
+            canonical = self._canonical_names()[name.lower()]
+        except AttributeError:
+            raise KeyError(name)
+        try:
+            timezone = self._loaded[canonical]
+        except KeyError:
+            timezone = pytz.timezone(canonical)
+            timezone.name = canonical
+            self._loaded[canonical] = timezone
+        self._loaded[name] = timezone
+        return timezone
+
+    def __contains__(self, name):
+        try:
+            if name in self._loaded:
+                return True
+            return name.lower() in self._canonical_names()
+        except (AttributeError, TypeError):
+            return False
+
+    def __iter__(self):
+        return iter(self._canonical_names().values())
+
+    def __len__(self):
+        return len(self._canonical_names())
+
+    def __repr__(self):
+        loaded = len(set(self._loaded.values()))
+        return '{}({} loaded)'.format(self.__class__.__name__, loaded)
+
+
+timezones = Timezones()
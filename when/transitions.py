@@ -0,0 +1,276 @@
+# standard libraries
+import sys
+import array
+import bisect
+import datetime
+# third party libraries
+import pytz
+# first party libraries
+from .timezones import timezones
+
+
+__all__ = ('Transitions', 'of', )
+
+
+_epoch = datetime.datetime(1970, 1, 1)
+_day = 86400000000
+_six_hours = 6*3600000000
+
+
+def _microseconds(timedelta):
+    return (timedelta.days*86400 + timedelta.seconds)*1000000 + timedelta.microseconds
+
+
+def _is_numpy(values):
+    # numpy is optional; if it hasn't been imported, values can't be an array
+    numpy = sys.modules.get('numpy')
+    return numpy is not None and isinstance(values, numpy.ndarray)
+
+
+class Transitions(object):
+    """ A timezone's UTC transitions and offsets compiled into sorted arrays.
+
+        All instants are integer microseconds since the epoch.  Converting
+        UTC to local time is a bisect plus an add, and converting local time
+        to UTC resolves ambiguous and non-existent times exactly as pytz's
+        ```localize``` does, with ```dst_if_ambiguous``` playing the part of
+        ```is_dst```.
+
+        >>> new_york = Transitions(pytz.timezone('America/New_York'))
+        >>> noon = _microseconds(datetime.datetime(2015, 7, 4, 12) - _epoch)
+        >>> new_york.utcoffset(noon)//3600000000
+        -4
+        >>> new_york.local_datetime(noon)
+        datetime.datetime(2015, 7, 4, 8, 0, tzinfo=<DstTzInfo 'America/New_York' EDT-1 day, 20:00:00 DST>)
+
+        At the end of daylight saving time 1:30am happens twice.
+
+        >>> local = _microseconds(datetime.datetime(2015, 11, 1, 1, 30) - _epoch)
+        >>> new_york.to_utc(local)
+        Traceback (most recent call last):
+        ...
+        pytz.exceptions.AmbiguousTimeError: 2015-11-01 01:30:00
+        >>> (new_york.to_utc(local, False) - new_york.to_utc(local, True))//60000000
+        60
+
+    """
+    def __init__(self, timezone):
+        self.timezone = timezone
+        try:
+            transition_times = timezone._utc_transition_times
+        except AttributeError:
+            # fixed offset zones, including UTC itself
+            minimum = datetime.datetime.min - _epoch
+            self.starts = array.array('q', [_microseconds(minimum)])
+            self.offsets = array.array('q', [_microseconds(timezone.utcoffset(None))])
+            self.dsts = (bool(timezone.dst(None)), )
+            self.tzinfos = (timezone, )
+        else:
+            infos = timezone._transition_info
+            self.starts = array.array('q', [_microseconds(time - _epoch) for
+                                            time in transition_times])
+            self.offsets = array.array('q', [_microseconds(info[0]) for
+                                             info in infos])
+            self.dsts = tuple(bool(info[1]) for info in infos)
+            self.tzinfos = tuple(timezone._tzinfos[info] for info in infos)
+        self._arrays = None
+
+    def index(self, epoch):
+        """ The index of the period in force at the UTC instant ```epoch```.
+
+        """
+        index = bisect.bisect_right(self.starts, epoch) - 1
+        return index if index > 0 else 0
+
+    def utcoffset(self, epoch):
+        return self.offsets[self.index(epoch)]
+
+    def to_local(self, epoch):
+        """ Convert a UTC instant into local wall-clock microseconds.
+
+        """
+        return epoch + self.offsets[self.index(epoch)]
+
+    def local_datetime(self, epoch):
+        """ The aware local datetime (with pytz's tzinfo) of a UTC instant.
+
+        """
+        index = self.index(epoch)
+        tzinfo = self.tzinfos[index]
+        return datetime.datetime(1970, 1, 1, tzinfo=tzinfo) + \
+            datetime.timedelta(microseconds=epoch + self.offsets[index])
+
+    def to_utc(self, local, dst_if_ambiguous=None):
+        """ Convert local wall-clock microseconds into a UTC instant.
+
+        """
+        offsets = self.offsets
+        index = self.index
+        # a time can only belong to the periods in force a day either side
+        candidates = {}
+        for neighbour in (index(local - _day), index(local + _day)):
+            epoch = local - offsets[neighbour]
+            actual = index(epoch)
+            if epoch + offsets[actual] == local:
+                candidates[epoch] = actual
+        if len(candidates) == 1:
+            for epoch in candidates:
+                return epoch
+        if len(candidates) == 0:
+            # the time was skipped over when the clocks went forward
+            if dst_if_ambiguous is None:
+                raise pytz.NonExistentTimeError(self._naive(local))
+            elif dst_if_ambiguous:
+                return self.to_utc(local + _six_hours, True) - _six_hours
+            else:
+                return self.to_utc(local - _six_hours, False) + _six_hours
+        # the time happened more than once as the clocks went back
+        if dst_if_ambiguous is None:
+            raise pytz.AmbiguousTimeError(self._naive(local))
+        dsts = self.dsts
+        filtered = [epoch for epoch in candidates if
+                    dsts[candidates[epoch]] == bool(dst_if_ambiguous)]
+        if len(filtered) == 1:
+            return filtered[0]
+        if len(filtered) == 0:
+            filtered = list(candidates)
+        return min(filtered) if dst_if_ambiguous else max(filtered)
+
+    def first_utc(self, local):
+        """ The first UTC instant at which the local wall-clock time is 
+            ```local``` or later.
+            
+            This is ```to_utc``` for ordinary times, the first occurrence of 
+            an ambiguous time, and the moment the clocks went forward for a 
+            time that was skipped.
+            
+            >>> new_york = Transitions(pytz.timezone('America/New_York'))
+            >>> skipped = _microseconds(datetime.datetime(2015, 3, 8, 2, 30) - _epoch)
+            >>> new_york.local_datetime(new_york.first_utc(skipped))
+            datetime.datetime(2015, 3, 8, 3, 0, tzinfo=<DstTzInfo 'America/New_York' EDT-1 day, 20:00:00 DST>)
+            
+        """
+        offsets = self.offsets
+        index = self.index
+        candidates = []
+        for neighbour in (index(local - _day), index(local + _day)):
+            epoch = local - offsets[neighbour]
+            if epoch + offsets[index(epoch)] == local:
+                candidates.append(epoch)
+        if candidates:
+            return min(candidates)
+        # skipped over; under the earlier offset the time lands after the 
+        # clocks went forward, in the period that begins at that moment
+        return self.starts[index(local - offsets[index(local - _day)])]
+
+    @staticmethod
+    def _naive(local):
+        return _epoch + datetime.timedelta(microseconds=local)
+
+    # bulk conversions
+
+    def _numpy_arrays(self):
+        import numpy
+        if self._arrays is None:
+            self._arrays = (numpy.frombuffer(self.starts, dtype=numpy.int64),
+                            numpy.frombuffer(self.offsets, dtype=numpy.int64))
+        return self._arrays
+
+    def utcoffsets(self, epochs):
+        """ The UTC offsets in force at many UTC instants in a single call.
+
+            NumPy int64 arrays are converted with one vectorized search; any
+            other iterable gives a list.
+
+        """
+        if _is_numpy(epochs):
+            import numpy
+            starts, offsets = self._numpy_arrays()
+            indices = numpy.searchsorted(starts, epochs, side='right') - 1
+            return offsets[numpy.maximum(indices, 0)]
+        offsets = self.offsets
+        index = self.index
+        return [offsets[index(epoch)] for epoch in epochs]
+
+    def to_local_many(self, epochs):
+        """ Convert many UTC instants into local wall-clock microseconds.
+
+            >>> new_york = Transitions(pytz.timezone('America/New_York'))
+            >>> epochs = [_microseconds(datetime.datetime(2015, month, 1) - _epoch)
+            ...           for month in (1, 7)]
+            >>> [(local - epoch)//3600000000 for local, epoch in
+            ...  zip(new_york.to_local_many(epochs), epochs)]
+            [-5, -4]
+
+        """
+        if _is_numpy(epochs):
+            return epochs + self.utcoffsets(epochs)
+        return [epoch + offset for epoch, offset in
+                zip(epochs, self.utcoffsets(epochs))]
+
+    def to_utc_many(self, local_times, dst_if_ambiguous=None):
+        """ Convert many local wall-clock times into UTC instants.
+
+            NumPy int64 arrays are converted with vectorized searches, and
+            only ambiguous or non-existent times fall back to ```to_utc```.
+
+        """
+        if not _is_numpy(local_times):
+            return [self.to_utc(local, dst_if_ambiguous) for local in local_times]
+        return self._to_utc_many(local_times, 
+                                 lambda local: self.to_utc(local, dst_if_ambiguous))
+
+    def first_utc_many(self, local_times):
+        """ ```first_utc``` of many local wall-clock times.
+        
+        """
+        if not _is_numpy(local_times):
+            return [self.first_utc(local) for local in local_times]
+        return self._to_utc_many(local_times, self.first_utc)
+
+    def _to_utc_many(self, local_times, fallback):
+        # vectorized conversion of a numpy array, calling fallback(local) for
+        # the times that are ambiguous or skipped
+        import numpy
+        starts, offsets = self._numpy_arrays()
+        def resolve(neighbours):
+            indices = numpy.maximum(numpy.searchsorted(starts, neighbours,
+                                                       side='right') - 1, 0)
+            epochs = local_times - offsets[indices]
+            actual = numpy.maximum(numpy.searchsorted(starts, epochs,
+                                                      side='right') - 1, 0)
+            return epochs, epochs + offsets[actual] == local_times
+        before, before_valid = resolve(local_times - _day)
+        after, after_valid = resolve(local_times + _day)
+        epochs = numpy.where(before_valid, before, after)
+        unique = (before_valid != after_valid) | (before_valid & (before == after))
+        for position in numpy.flatnonzero(~unique).tolist():
+            epochs[position] = fallback(int(local_times[position]))
+        return epochs
+
+    def __repr__(self):
+        return '{}({!r})'.format(self.__class__.__name__, self.timezone)
+
+
+_by_name = {}
+_by_timezone = {}
+
+
+def of(name):
+    """ Return the (cached) Transitions for the timezone called ```name```.
+
+        >>> of('america/new_york') is of('America/New_York')
+        True
+
+    """
+    try:
+        return _by_name[name]
+    except KeyError:
+        pass
+    timezone = timezones[name]
+    try:
+        transitions = _by_timezone[timezone]
+    except KeyError:
+        transitions = _by_timezone[timezone] = Transitions(timezone)
+    _by_name[name] = transitions
+    return transitions
@@ -1,13 +1,12 @@
 # standard libraries
 import datetime
-import calendar
 import pickle
-import collections
-import re
+import operator
 # third party libraries
 import pytz
 # first party libraries
-from . import (timezones, while_, substitutions, )
+from . import (timezones, while_, parsing, formatting, transitions, binary, 
+               calendars, clocks, )
 
 
 __all__ = ('When', 'now', 'parse', )
@@ -17,53 +16,15 @@ While = while_.While
 timezones = timezones.timezones
 
 
-def _scrub_potentials(*potentials):
-    potentials = [potential for potential in potentials if potential is not None]
-    if len(potentials) == 0:
-        return None
-    first = potentials[0]
-    if not all(first == potential for potential in potentials):
-        raise pytz.AmbiguousTimeError()
-    return first
+ParsingError = parsing.ParsingError
 
 
-class ParsingError(ValueError):
+_epoch = datetime.datetime(1970, 1, 1)
+_epoch_ordinal = _epoch.toordinal()
 
-    pass
 
-
-class NotNoneDict(collections.MutableMapping):
-
-    def __init__(self, defaults):
-        self._mapping = {}
-        self._mapping.update(defaults)
-
-    def __getitem__(self, item):
-        return self._mapping[item]
-
-    def __setitem__(self, item, value):
-        if item in self._mapping:
-            if value is not None:
-                self._mapping[item] = value
-            else:
-                pass
-        else:
-            self._mapping[item] = value
-
-    def __delitem__(self, item):
-        del self._mapping[item]
-
-    def __iter__(self):
-        return iter(self._mapping)
-
-    def __len__(self):
-        return len(self._mapping)
-
-    def __str__(self):
-        return str(self._mapping)
-
-    def __repr__(self):
-        return repr(self._mapping)
+def _microseconds(timedelta):
+    return (timedelta.days*86400 + timedelta.seconds)*1000000 + timedelta.microseconds
 
 
 class When(object):
@@ -98,18 +59,28 @@ class When(object):
         modified that would change the unique instant the object represents
         (put more technically, the UTC datetime is invariant), but timezones
         are mutable and are treated as views on the underlying instant.
+        
+        Internally, a When holds nothing but the instant, as an integer number
+        of microseconds since the UTC epoch, and the name of the timezone 
+        view; local fields are derived from these on demand.  Switching views 
+        does no work at all: the local datetime is only built when a field is 
+        first read (or the When is formatted), and is then cached per zone, 
+        in a dict shared by the views that ```with_timezone``` returns.
 
     """
+    __slots__ = ('_epoch', '_timezone', '_locals', )
+
     def __init__(self, year, month, day, hour=0, minute=0, second=0, 
                  microsecond=0, timezone=None, dst_if_ambiguous=None):
         if timezone is None or timezone not in timezones:
             raise ValueError('You must supply a valid timezone.')
         naive = datetime.datetime(year, month, day, hour, minute, 
                                   second, microsecond)
-        self._datetime = timezones[timezone].localize(naive, dst_if_ambiguous)
-        self._utc = self._datetime.astimezone(timezones['utc'])
+        local = ((naive.toordinal() - _epoch_ordinal)*86400 + hour*3600 + 
+                 minute*60 + second)*1000000 + microsecond
+        self._epoch = transitions.of(timezone).to_utc(local, dst_if_ambiguous)
         self._timezone = timezone
-        self._format_substitutor = None
+        self._locals = None
         
     # class constructors
 
@@ -122,6 +93,10 @@ class When(object):
             saving time transitions to be worried about, and we don't need to 
             supply kwarg ```dst_if_ambiguous```.
             
+            The instant is read from the current clock, which is the system 
+            clock unless another one (eg a coarse or manual clock) has been 
+            set with ```when.clocks.set_clock```.
+            
             >>> d = datetime.datetime.utcnow()
             >>> w = When.now()
             >>> (d.year, d.month, d.day, d.hour, d.minute, d.second) == \
@@ -129,11 +104,9 @@ class When(object):
             True
             
         """
-        utc = datetime.datetime.utcnow()
-        when = cls.from_datetime(utc, 'utc')
-        if timezones[timezone] != timezones['utc']:
-            when.timezone = timezone
-        return when
+        if timezone not in timezones:
+            raise ValueError('You must supply a valid timezone.')
+        return cls._from_epoch(clocks._clock.epoch(), timezone)
 
     @classmethod
     def from_datetime(cls, datetime, timezone, dst_if_ambiguous=None):
@@ -149,7 +122,7 @@ class When(object):
             >>> When.from_datetime(d, 'utc')
             Traceback (most recent call last):
             ...
-            AmbiguousTimeError: Cowardly refusing to ignore the supplied datetime's tzinfo in favor of the supplied timezone.
+            pytz.exceptions.AmbiguousTimeError: Cowardly refusing to ignore the supplied datetime's tzinfo in favor of the supplied timezone.
             >>> d = d.replace(tzinfo=None)
             >>> When.from_datetime(d, 'utc')
             When(2015, 1, 1, 0, 0, 0, 0, 'utc', False)
@@ -164,6 +137,16 @@ class When(object):
         kwargs['dst_if_ambiguous'] = dst_if_ambiguous
         return cls(**kwargs)
     
+    @classmethod
+    def _from_epoch(cls, epoch, timezone):
+        # construct directly from microseconds since the epoch, bypassing 
+        # __init__; timezone must already be known to be valid
+        when = cls.__new__(cls)
+        when._epoch = epoch
+        when._timezone = timezone
+        when._locals = None
+        return when
+    
     @classmethod
     def from_string(cls, string, specifier, century=None, year=None, month=None, 
                     day=None, hour=0, minute=0, second=0, millisecond=0, 
@@ -179,123 +162,145 @@ class When(object):
             When(2015, 3, 3, 2, 0, 59, 222222, 'utc', False)
             
         """
-        # pre-processing
-        if millisecond is not None and microsecond is None:
-            microsecond = 1000*millisecond
-        elif millisecond is not None and microsecond is not None:
-            if 1000*millisecond != microsecond:
-                raise pytz.AmbiguousTimeError()
-        # first pass of substitutions on specifier to prepare regex
-        substitutions_for_regex = {
-            '1776': r'(?P<_1776>\d?\d?\d?\d)',
-            '76': r'(?P<_76>\d\d)',
-            'July': r'(?P<_July>January|February|March|April|May|June|July|August|September|October|November|December)',
-            'Jul': r'(?P<_Jul>Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)',
-            'America/New_York': r'(?P<timezone>Z|z|[a-zA-Z_/]+)',
-            '012345': r'(?P<_012345>\d\d\d\d\d\d)',
-            '12345': r'(?P<_12345>\d?\d?\d?\d?\d?\d)',
-            '012': r'(?P<_012>\d\d\d)',
-            '12': r'(?P<_12>\d?\d?\d)',
-            '13': r'(?P<_13>\d\d)',
-            '07': r'(?P<_07>\d\d)',
-            '04': r'(?P<_04>\d\d)',
-            '03': r'(?P<_03>\d\d)',
-            '02': r'(?P<_02>\d\d)',
-            '01': r'(?P<_01>\d\d)',
-            '7': r'(?P<_7>\d?\d)',
-            '4': r'(?P<_4>\d?\d)',
-            '3': r'(?P<_3>\d?\d)',
-            '2': r'(?P<_2>\d?\d)',
-            '1': r'(?P<_1>\d?\d)',
-            'pm': r'(?P<_pm>am|pm)',
-            'p.m.': r'(?P<_p_m_>a\.m\.|p\.m\.)',
-            'PM': r'(?P<_PM>AM|PM)',
-            'P.M.': r'(?P<_P_M_>A\.M\.|P\.M\.)',
-        }
-        # iterate over specifiers and return first match
-        required_matches = ('year', 'month', 'day', 'timezone')
-        matched = NotNoneDict({
-            'year': year,
-            'month': month,
-            'day': day,
-            'hour': hour,
-            'minute': minute,
-            'second': second,
-            'microsecond': microsecond,
-            'timezone': timezone,
-            'dst_if_ambiguous': dst_if_ambiguous,
-        })  
-        regex = substitutions.in_string(specifier, substitutions_for_regex)
-        match = re.match(regex, string)
-        if match is None:
-            raise ParsingError()
-        unprocessed_matches = match.groupdict()
-        # process year
-        year_from_1776 = unprocessed_matches.get('_1776', None)
-        decade_from_76 = unprocessed_matches.get('_76', None)
-        _year_tuple = cls._process_year(year_from_1776, decade_from_76, century)
-        matched['year'] = _scrub_potentials(*_year_tuple)
-        # process month
-        month_from_July = unprocessed_matches.get('_July', None)
-        month_from_Jul = unprocessed_matches.get('_Jul', None)
-        month_from_07 = unprocessed_matches.get('_07', None)
-        month_from_7 = unprocessed_matches.get('_7', None)
-        _month_tuple = cls._process_month(month_from_July, month_from_Jul, month_from_07, 
-                                          month_from_7)
-        matched['month'] = _scrub_potentials(*_month_tuple)
-        # day
-        day_from_04 = unprocessed_matches.get('_04', None)
-        day_from_4 = unprocessed_matches.get('_4', None)
-        _day_tuple = cls._process_day(day_from_04, day_from_4)
-        matched['day'] = _scrub_potentials(*_day_tuple)
-        # hour
-        hour_from_13 = unprocessed_matches.get('_13', None)
-        hour_from_01 = unprocessed_matches.get('_01', None)
-        hour_from_1 = unprocessed_matches.get('_1', None)
-        meridian_from_pm = unprocessed_matches.get('_pm', None)
-        meridian_from_p_m_ = unprocessed_matches.get('_p_m_', None)
-        meridian_from_PM = unprocessed_matches.get('_PM', None)
-        meridian_from_P_M_ = unprocessed_matches.get('_P_M_', None)
-        _hour_tuple = cls._process_hour(hour_from_13, hour_from_01, hour_from_1, 
-                                        meridian_from_pm, meridian_from_p_m_, 
-                                        meridian_from_PM, meridian_from_P_M_)
-        matched['hour'] = _scrub_potentials(*_hour_tuple)
-        # minute
-        minute_from_02 = unprocessed_matches.get('_02', None)
-        minute_from_2 = unprocessed_matches.get('_2', None)
-        _minute_tuple = cls._process_minute(minute_from_02, minute_from_2)
-        matched['minute'] = _scrub_potentials(*_minute_tuple)
-        # second
-        second_from_03 = unprocessed_matches.get('_03', None)
-        second_from_3 = unprocessed_matches.get('_3', None)
-        _second_tuple = cls._process_second(second_from_03, second_from_3)
-        matched['second'] = _scrub_potentials(*_second_tuple)
-        # millisecond and microsecond
-        millisecond_from_012 = unprocessed_matches.get('_012', None)
-        millisecond_from_12 = unprocessed_matches.get('_12', None)
-        microsecond_from_12345 = unprocessed_matches.get('_12345', None)
-        microsecond_from_012345 = unprocessed_matches.get('_012345', None)
-        _microsecond_tuple = cls._process_fractional_sections(millisecond_from_012, 
-                                                              millisecond_from_12, 
-                                                              microsecond_from_12345, 
-                                                              microsecond_from_012345)
-        matched['microsecond'] = _scrub_potentials(*_microsecond_tuple)
-        # timezone
-        timezone_from_America_New_York = unprocessed_matches.get('timezone', None)
-        matched['timezone'] = cls._process_timezone(timezone_from_America_New_York)
-        # 
-        return cls(**matched)
+        parser = cls.compile_parser(specifier)
+        return parser(string, century=century, year=year, month=month, day=day,
+                      hour=hour, minute=minute, second=second, 
+                      millisecond=millisecond, microsecond=microsecond, 
+                      meridian=meridian, timezone=timezone, 
+                      dst_if_ambiguous=dst_if_ambiguous)
+
+    @classmethod
+    def parse_many(cls, strings, specifier=None, errors='raise', sentinel=None, 
+                   century=None, year=None, month=None, day=None, hour=0, 
+                   minute=0, second=0, millisecond=0, microsecond=0, 
+                   meridian=None, timezone=None, dst_if_ambiguous=None):
+        """ Lazily construct Whens from an iterable of strings that share a 
+            specifier.
+            
+            The specifier is compiled once and results are yielded one at a 
+            time, so memory stays flat however long the iterable is.  Rows 
+            that can't be parsed are handled according to ```errors```: 
+            ```'raise'``` (the default), ```'skip'``` or ```'sentinel'```, 
+            which yields ```sentinel``` in place of the row.
+            
+            >>> rows = ['2015-03-03 02:58:59', 'garbage', '2015-03-04 02:58:59']
+            >>> for when in When.parse_many(rows, '1776-07-04 13:02:03', 
+            ...                             errors='skip', timezone='utc'):
+            ...     print(when)
+            2015-03-03 02:58:59+00:00
+            2015-03-04 02:58:59+00:00
+            >>> list(When.parse_many(rows, '1776-07-04 13:02:03', 
+            ...                      errors='sentinel', timezone='utc'))[1] is None
+            True
+            
+            Without a specifier, one is inferred from the first few rows (see 
+            ```infer_specifier```) and only inferred again when a row doesn't 
+            fit it, so a column of unknown (or changing) format parses as 
+            fast as one with a known specifier.
+            
+            >>> rows = ['Mar 3, 2015 2:58 pm', 'Mar 4, 2015 2:58 pm', '2015-03-05']
+            >>> for when in When.parse_many(rows, timezone='utc'):
+            ...     print(when)
+            2015-03-03 14:58:00+00:00
+            2015-03-04 14:58:00+00:00
+            2015-03-05 00:00:00+00:00
+            
+        """
+        if specifier is None:
+            parser = parsing.InferringParser(cls)
+        else:
+            parser = cls.compile_parser(specifier)
+        return parser.many(strings, errors=errors, sentinel=sentinel, 
+                           century=century, year=year, month=month, day=day, 
+                           hour=hour, minute=minute, second=second, 
+                           millisecond=millisecond, microsecond=microsecond, 
+                           meridian=meridian, timezone=timezone, 
+                           dst_if_ambiguous=dst_if_ambiguous)
+
+    @classmethod
+    def infer_specifier(cls, samples, candidates=None):
+        """ Detect the specifier that a handful of sample strings follow.
+            
+            Common date and time layouts (or ```candidates```) are tried in 
+            order, and the first that fully matches every sample with a valid 
+            date and time is returned; when the samples can't tell month-first 
+            from day-first dates, month-first wins.
+            
+            >>> When.infer_specifier(['2015-03-03T02:58:59Z', '2015-03-04T02:58:59Z'])
+            '1776-07-04T13:02:03America/New_York'
+            >>> When.infer_specifier(['22 Apr 2015', '4 Jul 1776'])
+            '4 Jul 1776'
+            
+        """
+        return parsing.infer(samples, candidates)
+
+    @classmethod
+    def compile_parser(cls, specifier):
+        """ Compile a specifier once into a reusable parser.
+        
+            The parser accepts the same keyword arguments as 
+            ```from_string```.  Compiled specifiers are shared through a 
+            bounded LRU cache, so ```from_string``` benefits as well.
+            
+            >>> parser = When.compile_parser('1776-07-04 13:02:03')
+            >>> parser('2015-03-03 02:58:59', timezone='utc')
+            When(2015, 3, 3, 2, 58, 59, 0, 'utc', False)
+            >>> parser('2015-03-04 02:58:59', timezone='utc')
+            When(2015, 3, 4, 2, 58, 59, 0, 'utc', False)
+            
+        """
+        return parsing.Parser(cls, parsing.compile(specifier))
 
     @classmethod
     def from_iso_format(cls, string, timezone=None, dst_if_ambiguous=None):
-        """ Construct a When from the 
+        """ Construct a When from an ISO-8601 (or RFC 3339) formatted string.
+            
+            ISO timestamps are parsed in a single pass.  A numeric UTC offset 
+            (or a trailing ```Z```, the same as ```+00:00```) fixes the 
+            instant, which is then viewed in ```timezone``` (UTC if omitted). 
+            Otherwise the string is read as local time in ```timezone```.
             
             >>> When.from_iso_format('2015-03-03T02:00:59', timezone='utc')
             When(2015, 3, 3, 2, 0, 59, 0, 'utc', False)
             >>> When.from_iso_format('2015-03-03T02:00:59.123422Z', timezone='utc')
             When(2015, 3, 3, 2, 0, 59, 123422, 'utc', False)
+            >>> When.from_iso_format('20150303T020059-0500')
+            When(2015, 3, 3, 7, 0, 59, 0, 'utc', False)
+            >>> print(When.from_iso_format('2015-03-03T02:00:59.5-05:00', 
+            ...                            timezone='America/New_York'))
+            2015-03-03 02:00:59.500000-05:00
+            >>> for string in ('2015-03-03T07:00:59Z', '2015-03-03T07:00:59+00:00'):
+            ...     print(When.from_iso_format(string, timezone='America/New_York'))
+            2015-03-03 02:00:59-05:00
+            2015-03-03 02:00:59-05:00
+            
+            Anything else goes through the more forgiving (and much slower) 
+            ```from_string``` machinery.
+            
+            >>> When.from_iso_format('2015-03-03America/New_York')
+            When(2015, 3, 3, 0, 0, 0, 0, 'America/New_York', False)
                         
         """
+        parsed = parsing.iso_fields(string)
+        if parsed is None:
+            return cls._from_iso_format_generic(string, timezone, dst_if_ambiguous)
+        fields, offset = parsed
+        if fields.pop('timezone', None) == 'utc':
+            # a Z is just another spelling of +00:00
+            offset = 0
+        if offset is not None:
+            utc = datetime.datetime(**fields) - datetime.timedelta(minutes=offset)
+            when = cls.from_datetime(utc, 'utc')
+            if timezone is not None:
+                when.timezone = timezone
+            return when
+        fields.setdefault('timezone', timezone)
+        if fields['timezone'] is None:
+            raise ParsingError('A timezone is required to parse {!r}.'.format(string))
+        return cls(dst_if_ambiguous=dst_if_ambiguous, **fields)
+
+    @classmethod
+    def _from_iso_format_generic(cls, string, timezone=None, dst_if_ambiguous=None):
         specifiers = (
                           '1776[-]?07[-]?04[T ]?13[:]?02[:]?03.012345America/New_York',
                           '1776[-]?07[-]?04[T ]?13[:]?02[:]?03.0123America/New_York',
@@ -310,155 +315,9 @@ class When(object):
             try:
                 return cls.from_string(string, specifier, timezone=timezone, 
                                        dst_if_ambiguous=dst_if_ambiguous)
-            except:
+            except (ValueError, pytz.InvalidTimeError):
                 continue
-        raise ParsingError()
-
-    # process support
-    
-    @staticmethod
-    def _process_year(year_from_1776, decade_from_76, century):
-        # pre-process
-        if decade_from_76 is not None:
-            if century is None:
-                raise pytz.ValueError()
-            year_from_76 = century + int(decade_from_76)
-        else:
-            year_from_76 = None
-        if year_from_1776 is not None:
-            year_from_1776 = int(year_from_1776)
-            if century is not None:
-                if abs(year_from_1776 - century) > 100:
-                    raise pytz.AmbiguousTimeError()
-        # return year, catching any ambiguities
-        return (year_from_1776, year_from_76)
-    
-    @staticmethod
-    def _process_month(month_from_July, month_from_Jul, month_from_07, month_from_7):
-        month_to_int = {
-            'January': 1,
-            'Jan': 1,
-            'February': 2,
-            'Feb': 2,
-            'March': 3,
-            'Mar': 3,
-            'April': 4,
-            'Apr': 4,
-            'May': 5,
-            'June': 6,
-            'Jun': 6,
-            'July': 7,
-            'Jul': 7,
-            'August': 8,
-            'Aug': 8,
-            'September': 9,
-            'Sep': 9,
-            'October': 10,
-            'Oct': 10,
-            'November': 11,
-            'Nov': 11,
-            'December': 12,
-            'Dec': 12,
-            None: None
-        }
-        month_from_July = month_to_int[month_from_July]
-        month_from_Jul = month_to_int[month_from_Jul]
-        if month_from_07 is not None:
-            month_from_07 = int(month_from_07)
-        if month_from_7 is not None:
-            month_from_7 = int(month_from_7)
-        # return month, catching any ambiguities
-        return (month_from_July, month_from_Jul, month_from_07, month_from_7)
-    
-    @staticmethod
-    def _process_day(day_from_04, day_from_4):
-        # pre-process
-        if day_from_04 is not None:
-            day_from_04 = int(day_from_04)
-        if day_from_4 is not None:
-            day_from_4 = int(day_from_4)
-        # return day, catching any ambiguities
-        return (day_from_04, day_from_4)
-    
-    @staticmethod
-    def _process_hour(hour_from_13, hour_from_01, hour_from_1, meridian_from_pm,
-                      meridian_from_p_m_, meridian_from_PM, meridian_from_P_M_):
-        # pre-process
-        if meridian_from_pm is not None:
-            if meridian_from_pm == 'pm':
-                meridian_from_pm = 12
-            else: # am
-                meridian_from_pm = 0
-        if meridian_from_p_m_ is not None:
-            if meridian_from_p_m_ == 'p.m.':
-                meridian_from_p_m_ = 12
-            else: # a.m.
-                meridian_from_p_m_ = 0
-        if meridian_from_PM is not None:
-            if meridian_from_PM == 'PM':
-                meridian_from_PM = 12
-            else: # AM
-                meridian_from_PM = 0
-        if meridian_from_P_M_ is not None:
-            if meridian_from_P_M_ == 'P.M.':
-                meridian_from_P_M_ = 12
-            else: # AM
-                meridian_from_P_M_ = 0
-        meridian_offset = _scrub_potentials(meridian_from_pm, meridian_from_p_m_, 
-                                            meridian_from_PM, meridian_from_P_M_)
-        if meridian_offset is None:
-            meridian_offset = 0
-        if hour_from_13 is not None:
-            hour_from_13 = int(hour_from_13)
-        if hour_from_01 is not None:
-            hour_from_01 = meridian_offset + int(hour_from_01)
-        if hour_from_1 is not None:
-            hour_from_1 = meridian_offset + int(hour_from_1)
-        # return hour, catching any ambiguities
-        return (hour_from_13, hour_from_01, hour_from_1)
-    
-    @staticmethod
-    def _process_minute(minute_from_02, minute_from_2):
-        # pre-process
-        if minute_from_02 is not None:
-            minute_from_02 = int(minute_from_02)
-        if minute_from_2 is not None:
-            minute_from_2 = int(minute_from_2)
-        # return minute, catching any ambiguities
-        return (minute_from_02, minute_from_2)
-    
-    @staticmethod
-    def _process_second(second_from_03, second_from_3):
-        # pre-process
-        if second_from_03 is not None:
-            second_from_03 = int(second_from_03)
-        if second_from_3 is not None:
-            second_from_3 = int(second_from_3)
-        # return second, catching any ambiguities
-        return (second_from_03, second_from_3)
-    
-    @staticmethod
-    def _process_fractional_sections(millisecond_from_012, millisecond_from_12, microsecond_from_12345,
-                                     microsecond_from_012345):
-        # pre-process
-        if millisecond_from_012 is not None:
-            millisecond_from_012 = 1000*int(millisecond_from_012)
-        if millisecond_from_12 is not None:
-            millisecond_from_12 = 1000*int(millisecond_from_12)
-        if microsecond_from_12345 is not None:
-            microsecond_from_12345 = int(microsecond_from_12345)
-        if microsecond_from_012345 is not None:
-            microsecond_from_012345 = int(microsecond_from_012345)
-        # return second, catching any ambiguities
-        return (millisecond_from_012, millisecond_from_12, microsecond_from_12345,
-                microsecond_from_012345)
-    
-    @staticmethod
-    def _process_timezone(timezone_from_America_New_York):
-        if timezone_from_America_New_York in ('z', 'Z'):
-            return 'utc'
-        else:
-            return timezone_from_America_New_York
+        raise ParsingError('{!r} is not in a recognized ISO format.'.format(string))
 
     # timezone-related
 
@@ -485,10 +344,35 @@ class When(object):
             <DstTzInfo 'America/Los_Angeles' LMT-1 day, 16:07:00 STD>
         
         """
-        _tz = timezones[timezone]
-        self._datetime = _tz.normalize(self._utc.astimezone(_tz))
+        timezones[timezone]
         self._timezone = timezone
-        self._format_substitor = None
+
+    def with_timezone(self, timezone):
+        """ Return a new view on the same instant in ```timezone```, leaving 
+            this one as it is.
+            
+            Views share the instant and the local datetimes cached for it, so 
+            reading fields in a zone that another view has already read is 
+            free.
+            
+            >>> earth_day = When(year=2015, month=4, day=22, hour=5, 
+            ...                  timezone='America/New_York')
+            >>> print(earth_day.with_timezone('Europe/London'))
+            2015-04-22 10:00:00+01:00
+            >>> print(earth_day)
+            2015-04-22 05:00:00-04:00
+            >>> earth_day.with_timezone('utc') == earth_day
+            True
+            
+        """
+        if timezone not in timezones:
+            raise ValueError('You must supply a valid timezone.')
+        view = self._from_epoch(self._epoch, timezone)
+        if self._locals is None:
+            # nothing has been read yet, so start the cache to share it
+            self._locals = {}
+        view._locals = self._locals
+        return view
 
     @property
     def dst(self):
@@ -587,51 +471,18 @@ class When(object):
             '30 minutes past 5am'
 
         """
-        return self.format_substitutor(specifier)
-    
-    def _update_format_substitutor(self):
-        format_substitutions = {
-            '1776': self.datetime.strftime('%Y'),
-            '012345': self.datetime.strftime('%f'),
-            '12345': self.datetime.strftime('%f').lstrip('0'),
-            '012': self.datetime.strftime('%f')[:3],
-            '76': self.datetime.strftime('%y'),
-            '13': self.datetime.strftime('%H'),
-            '12': self.datetime.strftime('%f')[:3].lstrip('0'),
-            '-04:00': '{}:{}'.format(self.datetime.strftime('%z')[:-2], self.datetime.strftime('%z')[-2:]),
-            '-0400': self.datetime.strftime('%z'),
-            'July': self.datetime.strftime('%B'),
-            'Jul': self.datetime.strftime('%b'),
-            '01': self.datetime.strftime('%I'),
-            '02': self.datetime.strftime('%M'),
-            '03': self.datetime.strftime('%S'),
-            '04': self.datetime.strftime('%d'),
-            '07': self.datetime.strftime('%m'),
-            '1': self.datetime.strftime('%I').lstrip('0'),
-            '2': self.datetime.strftime('%M').lstrip('0'),
-            '3': self.datetime.strftime('%S').lstrip('0'),
-            '4': self.datetime.strftime('%d').lstrip('0'),
-            '7': self.datetime.strftime('%m').lstrip('0'),
-            'America/New_York': self._timezone,
-            'Thursday': self.datetime.strftime('%A'),
-            'Thu': self.datetime.strftime('%a'),
-            'th': self.inflection,
-            'PM': 'AM' if self.hour < 12 else 'PM',
-            'P.M.': 'A.M.' if self.hour < 12 else 'P.M.',
-            'pm': 'am' if self.hour < 12 else 'pm',
-            'p.m.': 'a.m.' if self.hour < 12 else 'p.m.',
-        }
-        self._format_substitutor = substitutions.Substitutor(format_substitutions)
+        return formatting.compile(specifier)(self.datetime, self._timezone)
 
     @property
     def format_substitutor(self):
-        """ Dynamically compute a set of substitutions that transform the 
-            reference date to the instant represented by this When.
+        """ A callable that transforms a specifier written in terms of the 
+            reference date into the instant represented by this When.
+            
+            The specifier is compiled into a plan that is cached and shared 
+            across all instances (see ```when.formatting```).
         
         """
-        if self._format_substitutor is None:
-            self._update_format_substitutor()
-        return self._format_substitutor
+        return self.__format__
 
     @property
     def inflection(self):
@@ -665,13 +516,24 @@ class When(object):
             timezone view.
             
         """
-        return self._datetime
+        locals_ = self._locals
+        if locals_ is None:
+            # the cache is only created once a field is read
+            locals_ = self._locals = {}
+        else:
+            local = locals_.get(self._timezone)
+            if local is not None:
+                return local
+        local = locals_[self._timezone] = transitions.of(
+            self._timezone).local_datetime(self._epoch)
+        return local
 
     @property
     def utc(self):
         """ Exposes the When instant in UTC as an attribute.
         
-            This is cached upon first use given that it is invariant/immutable.
+            A new When is returned on each access, which is cheap because it 
+            shares the underlying instant.
         
             >>> earth_day = When(year=2015, month=4, day=22, hour=5, 
             ...                  timezone='America/New_York')
@@ -682,13 +544,7 @@ class When(object):
             2015-04-22 09:00:00+00:00
         
         """
-        try:
-            utc = self._when_utc
-        except AttributeError:
-            cls = self.__class__
-            utc = cls.from_datetime(self._utc.replace(tzinfo=None), 'utc')
-            self._when_utc = utc
-        return self._when_utc
+        return self.with_timezone('utc')
 
     @property
     def year(self):
@@ -838,7 +694,7 @@ class When(object):
 
     @property
     def timestamp(self):
-        return calendar.timegm(self.utc.datetime.timetuple())
+        return self._epoch//1000000
     
     posix_time = unix_time = timestamp
 
@@ -874,14 +730,6 @@ class When(object):
         return {attribute: getattr(datetime, attribute) for 
                 attribute in attributes}
 
-    @property
-    def _immutable_attributes_tuple(self):
-        attributes = ('year', 'month', 'day', 'hour', 'minute', 
-                      'second', 'microsecond')
-        return tuple(getattr(self.utc, attribute) for attribute in attributes)
-
-    _comparison_tuple = _immutable_attributes_tuple
-
     @property
     def _init_tuple(self):
         attributes = ('year', 'month', 'day', 'hour', 'minute', 
@@ -890,6 +738,11 @@ class When(object):
 
     # comparison
 
+    # key function for sorting and bisecting at C speed, eg 
+    # sorted(whens, key=When.sort_key); the key is the integer instant, so it 
+    # orders Whens exactly as the comparison operators do
+    sort_key = operator.attrgetter('_epoch')
+
     def __eq__(self, other):
         """ Returns equivalence against other When-like objects.
         
@@ -902,7 +755,9 @@ class When(object):
             True
         
         """
-        return self._comparison_tuple == other._comparison_tuple
+        if isinstance(other, When):
+            return self._epoch == other._epoch
+        return NotImplemented
 
     def __lt__(self, other):
         """ Returns less than operator against other When-like objects.
@@ -911,8 +766,21 @@ class When(object):
                 When(2015, 1, 1, timezone='utc')
             False
             
+            Sorting (or bisecting) with ```When.sort_key``` avoids calling this
+            operator altogether.
+            
+            >>> import bisect
+            >>> whens = [When(2015, 1, day, timezone='utc') for day in (3, 1, 2)]
+            >>> [when.day for when in sorted(whens, key=When.sort_key)]
+            [1, 2, 3]
+            >>> keys = sorted(map(When.sort_key, whens))
+            >>> bisect.bisect(keys, When.sort_key(When(2015, 1, 2, timezone='utc')))
+            2
+            
         """
-        return self._comparison_tuple < other._comparison_tuple
+        if isinstance(other, When):
+            return self._epoch < other._epoch
+        return NotImplemented
 
     def __le__(self, other):
         """ Returns less than or equal operator against When-like objects.
@@ -922,7 +790,9 @@ class When(object):
             True
             
         """
-        return self._comparison_tuple <= other._comparison_tuple
+        if isinstance(other, When):
+            return self._epoch <= other._epoch
+        return NotImplemented
 
     def __gt__(self, other):
         """ Returns greater than operator against other When-like objects.
@@ -932,7 +802,9 @@ class When(object):
             False
             
         """
-        return self._comparison_tuple > other._comparison_tuple
+        if isinstance(other, When):
+            return self._epoch > other._epoch
+        return NotImplemented
 
     def __ge__(self, other):
         """ Returns greater than or equal operator against When-like objects.
@@ -942,12 +814,18 @@ class When(object):
             True
             
         """
-        return self._comparison_tuple >= other._comparison_tuple
+        if isinstance(other, When):
+            return self._epoch >= other._epoch
+        return NotImplemented
     
     # artihmetic
     
     def __add__(self, other):
-        """ 
+        """ Add a While (or timedelta) to the instant.
+        
+            The arithmetic is done on the integer UTC instant and the result
+            keeps this timezone view, whose local fields are only derived 
+            when they are read.
         
             >>> earth_day = When(year=2015, month=4, day=22, hour=5, 
             ...                  timezone='America/New_York')
@@ -956,19 +834,12 @@ class When(object):
             2015-04-23 05:00:00-04:00
         
         """
-        cls = self.__class__
         if isinstance(other, While):
-            when = cls.from_datetime(
-                self._utc.replace(tzinfo=None) + other.timedelta, 'utc'
-            )
-            when.timezone = self.timezone.name
-            return when
+            return self._from_epoch(self._epoch + other._microseconds, 
+                                    self._timezone)
         elif isinstance(other, datetime.timedelta):
-            when = cls.from_datetime(
-                self._utc.replace(tzinfo=None) + other, 'utc'
-            )
-            when.timezone = self.timezone.name
-            return when
+            return self._from_epoch(self._epoch + _microseconds(other), 
+                                    self._timezone)
         else:
             return NotImplemented
     
@@ -979,7 +850,7 @@ class When(object):
             return self.__add__(other)
             
     def __sub__(self, other):
-        """
+        """ Subtract a While (or timedelta), or the While between two Whens.
         
             >>> earth_day = When(year=2015, month=4, day=22, hour=5, 
             ...                  timezone='America/New_York')
@@ -992,25 +863,185 @@ class When(object):
             24.0
         
         """
-        cls = self.__class__
         if isinstance(other, While):
-            when = cls.from_datetime(
-                self._utc.replace(tzinfo=None) - other.timedelta, 'utc'
-            )
-            when.timezone = self.timezone.name
-            return when
+            return self._from_epoch(self._epoch - other._microseconds, 
+                                    self._timezone)
         elif isinstance(other, datetime.timedelta):
-            when = cls.from_datetime(
-                self._utc.replace(tzinfo=None) - other, 'utc'
-            )
-            when.timezone = self.timezone.name
-            return when
+            return self._from_epoch(self._epoch - _microseconds(other), 
+                                    self._timezone)
         elif isinstance(other, When):
-            return While.from_timedelta(
-                self._utc.replace(tzinfo=None) - other._utc.replace(tzinfo=None)
-            )
+            return While._from_microseconds(self._epoch - other._epoch)
         else:
             return NotImplemented
+
+    # iteration
+
+    @classmethod
+    def range(cls, start, stop, step, dst_if_ambiguous=False):
+        """ Lazily generate Whens from ```start``` up to (but excluding) 
+            ```stop```, in the timezone view of ```start```.
+            
+            A While (or timedelta) ```step``` is added to the UTC instant, so 
+            every result is exactly the same duration apart.  A calendar 
+            ```step``` such as ```'day'```, ```'week'```, ```'month'```, 
+            ```'quarter'```, ```'year'``` or ```'3 months'``` instead keeps the
+            local wall-clock time of ```start``` in its timezone across 
+            daylight saving time transitions (so stepping by ```'day'``` from 
+            a midnight gives every local midnight), and clamps the day to the 
+            end of shorter months.  Wall-clock times that are ambiguous or do 
+            not exist are resolved by ```dst_if_ambiguous```, as in the 
+            constructor.  Negative steps count backwards, and a ```stop``` of 
+            None never stops.  ```WhenArray.range``` builds the same sequence 
+            as an array.
+            
+            >>> start = When(2015, 3, 7, timezone='America/New_York')
+            >>> stop = When(2015, 3, 10, timezone='America/New_York')
+            >>> [when.hour for when in When.range(start, stop, While(days=1))]
+            [0, 0, 1]
+            >>> [when.hour for when in When.range(start, stop, 'day')]
+            [0, 0, 0]
+            >>> start = When(2015, 1, 31, timezone='utc')
+            >>> months = When.range(start, When(2015, 6, 1, timezone='utc'), 'month')
+            >>> [when.day for when in months]
+            [31, 28, 31, 30, 31]
+            
+        """
+        timezone = start._timezone
+        stop = None if stop is None else stop._epoch
+        if isinstance(step, While):
+            step = step._microseconds
+        elif isinstance(step, datetime.timedelta):
+            step = _microseconds(step)
+        else:
+            return cls._calendar_range(start, stop, calendars.parse_step(step),
+                                       dst_if_ambiguous)
+        if step == 0:
+            raise ValueError('A step must not be zero.')
+        return cls._fixed_range(start._epoch, stop, step, timezone)
+
+    @classmethod
+    def _fixed_range(cls, epoch, stop, step, timezone):
+        from_epoch = cls._from_epoch
+        if stop is None:
+            while True:
+                yield from_epoch(epoch, timezone)
+                epoch += step
+        while epoch < stop if step > 0 else epoch > stop:
+            yield from_epoch(epoch, timezone)
+            epoch += step
+
+    @classmethod
+    def _calendar_range(cls, start, stop, step, dst_if_ambiguous):
+        unit, count = step
+        timezone = start._timezone
+        zone = transitions.of(timezone)
+        to_utc = zone.to_utc
+        shift = calendars.shift
+        from_epoch = cls._from_epoch
+        anchor = zone.to_local(start._epoch)
+        epoch = start._epoch
+        steps = 0
+        # each result is shifted from the anchor, not from the previous result,
+        # so clamping at the end of a short month doesn't carry forwards
+        while stop is None or (epoch < stop if count > 0 else epoch > stop):
+            yield from_epoch(epoch, timezone)
+            steps += count
+            epoch = to_utc(shift(anchor, unit, steps), dst_if_ambiguous)
+    
+    # truncation
+
+    def _bucket(self, unit, timezone):
+        if timezone is None:
+            timezone = self._timezone
+        elif timezone not in timezones:
+            raise ValueError('You must supply a valid timezone.')
+        unit, count = calendars.parse_unit(unit)
+        floor, ceiling = calendars.bucket(transitions.of(timezone), self._epoch, 
+                                          unit, count)
+        return floor, ceiling, timezone
+
+    def floor(self, unit, timezone=None):
+        """ The start of the ```unit``` containing this instant.
+            
+            Fixed units (```'second'```, ```'15 minutes'```, ```'hour'```, 
+            ...) are truncated on the local clock with integer arithmetic.
+            Calendar units (```'day'```, ```'week'```, ```'month'```, 
+            ```'quarter'```, ```'year'``` and multiples such as 
+            ```'2 days'```) start at local midnight, at the first instant of 
+            that day when daylight saving time skips or repeats midnight.  
+            Local time is that of ```timezone```, which is also the view of 
+            the result, and defaults to this When's view.
+            
+            >>> when = When(2015, 11, 1, 10, 47, timezone='America/New_York')
+            >>> print(when.floor('15 minutes'))
+            2015-11-01 10:45:00-05:00
+            >>> print(when.floor('day'))
+            2015-11-01 00:00:00-04:00
+            >>> print(when.floor('month', timezone='utc'))
+            2015-11-01 00:00:00+00:00
+            
+        """
+        floor, ceiling, timezone = self._bucket(unit, timezone)
+        return self._from_epoch(floor, timezone)
+
+    def ceil(self, unit, timezone=None):
+        """ The start of the next ```unit```, unless this instant is already 
+            the start of one (see ```floor```).
+            
+            >>> print(When(2015, 11, 1, 10, 47, timezone='America/New_York').ceil('day'))
+            2015-11-02 00:00:00-05:00
+            
+        """
+        floor, ceiling, timezone = self._bucket(unit, timezone)
+        return self._from_epoch(floor if floor == self._epoch else ceiling, 
+                                timezone)
+
+    def round(self, unit, timezone=None):
+        """ The nearer of ```floor``` and ```ceil```, rounding halves up.
+            
+            >>> print(When(2015, 4, 22, 12, 30, timezone='utc').round('hour'))
+            2015-04-22 13:00:00+00:00
+            
+        """
+        floor, ceiling, timezone = self._bucket(unit, timezone)
+        nearer = floor if self._epoch - floor < ceiling - self._epoch else ceiling
+        return self._from_epoch(nearer, timezone)
+
+    @classmethod
+    def floor_many(cls, whens, unit, timezone=None):
+        """ ```floor``` each of many Whens, for use as bucket keys.
+            
+            The unit is parsed once, and the last calendar period found is 
+            reused while the instants stay inside it, so runs of nearby 
+            instants only cost a comparison each.  With no 
+            ```timezone```, each When is bucketed in its own view.
+            
+            >>> whens = [When(2015, 4, 22, hour, timezone='utc') for hour in (1, 5, 23)]
+            >>> [str(floor) for floor in When.floor_many(whens, 'day', 
+            ...                                          timezone='Asia/Tokyo')]
+            ['2015-04-22 00:00:00+09:00', '2015-04-22 00:00:00+09:00', '2015-04-23 00:00:00+09:00']
+            
+        """
+        if timezone is not None and timezone not in timezones:
+            raise ValueError('You must supply a valid timezone.')
+        unit, count = calendars.parse_unit(unit)
+        bucket = calendars.bucket
+        from_epoch = cls._from_epoch
+        floors = []
+        zone = view = floor = ceiling = None
+        for when in whens:
+            epoch = when._epoch
+            if timezone is None and when._timezone != view:
+                view = when._timezone
+                zone, floor = transitions.of(view), None
+            elif zone is None:
+                view = timezone
+                zone = transitions.of(view)
+            # fixed units are cheaper to recompute than to check
+            if unit == 'fixed' or floor is None or not floor <= epoch < ceiling:
+                floor, ceiling = bucket(zone, epoch, unit, count)
+            floors.append(from_epoch(floor, view))
+        return floors
     
     # representation
 
@@ -1036,10 +1067,10 @@ class When(object):
         """ Return the hash of a When instance.
         
             The unique instant represented by a When is defined unambiguously
-            by a hash of the utc immutable attributes.
+            by its integer number of microseconds since the epoch.
         
         """
-        return hash(self._immutable_attributes_tuple)
+        return hash(self._epoch)
 
     # pickle-related
     
@@ -1059,8 +1090,107 @@ class When(object):
             >>> earth_day.timezone == timezones['America/New_York']
             True
             
+            Instances are pickled in their compact binary form (see 
+            ```to_bytes```).
+            
+        """
+        return (self.__class__.from_bytes, (self.to_bytes(), ))
+
+    # binary serialization
+
+    def to_bytes(self):
+        """ Encode the When as ten bytes: the int64 epoch microseconds and a 
+            uint16 id for the timezone view.
+            
+            Zone ids index the frozen, append-only table in 
+            ```when/zone_table.py```, so they decode to the canonical spelling 
+            of the same zone under any pytz release.
+            
+            >>> earth_day = When(2015, 4, 22, timezone='America/New_York')
+            >>> len(earth_day.to_bytes())
+            10
+            >>> When.from_bytes(earth_day.to_bytes())
+            When(2015, 4, 22, 0, 0, 0, 0, 'America/New_York', True)
+            
+            A zone that pytz added after the table was last extended has no 
+            id, so it is written as the reserved id ```binary.unlisted``` 
+            followed by the zone's name, and such Whens still pickle:
+            
+            >>> listed = binary._table_ids.pop('Europe/London')
+            >>> binary._ids.clear()
+            >>> london = When(2015, 4, 22, timezone='Europe/London')
+            >>> london.to_bytes()[8:]
+            b'\\xff\\xffEurope/London'
+            >>> copy = pickle.loads(pickle.dumps(london))
+            >>> copy == london, copy.timezone.name
+            (True, 'Europe/London')
+            >>> binary._table_ids['Europe/London'] = listed
+            
+        """
+        try:
+            id = binary.zone_id(self._timezone)
+        except ValueError:
+            name = timezones[self._timezone].name.encode('utf-8')
+            return binary.when_struct.pack(self._epoch, binary.unlisted) + name
+        return binary.when_struct.pack(self._epoch, id)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """ Construct a When from the output of ```to_bytes```.
+        
+        """
+        struct = binary.when_struct
+        epoch, id = struct.unpack_from(data)
+        if id == binary.unlisted:
+            return cls._from_epoch(epoch, bytes(data[struct.size:]).decode('utf-8'))
+        return cls._from_epoch(epoch, binary.zone_name(id))
+
+    @classmethod
+    def dumps_many(cls, whens, buffer=None, offset=0):
+        """ Encode many Whens back to back, as ```to_bytes``` would.
+            
+            Each When is packed straight into ```buffer``` (a bytearray or 
+            writable memoryview), starting at byte ```offset```.  When no 
+            buffer is supplied, a bytearray of the right size is allocated.
+            The buffer is returned.  Records are fixed width, so every zone 
+            must have an id (see ```to_bytes```); a ValueError is raised for 
+            one that doesn't.
+            
+            >>> whens = [When(2015, 4, 22, timezone='America/New_York'), 
+            ...          When(2015, 4, 23, timezone='utc')]
+            >>> buffer = When.dumps_many(whens)
+            >>> len(buffer)
+            20
+            >>> When.loads_many(buffer) == whens
+            True
+            
+        """
+        struct = binary.when_struct
+        if buffer is None:
+            if not hasattr(whens, '__len__'):
+                whens = list(whens)
+            buffer = bytearray(offset + struct.size*len(whens))
+        pack_into = struct.pack_into
+        zone_id = binary.zone_id
+        size = struct.size
+        for when in whens:
+            pack_into(buffer, offset, when._epoch, zone_id(when._timezone))
+            offset += size
+        return buffer
+
+    @classmethod
+    def loads_many(cls, buffer, offset=0, count=None):
+        """ Decode ```count``` Whens (or all of them) written by 
+            ```dumps_many```, starting at byte ```offset``` of ```buffer```.
+        
         """
-        return (self.__class__, self._init_tuple, )
+        size = binary.when_struct.size
+        view = memoryview(buffer)
+        stop = len(view) if count is None else offset + size*count
+        from_epoch = cls._from_epoch
+        zone_name = binary.zone_name
+        return [from_epoch(epoch, zone_name(id)) for epoch, id in 
+                binary.when_struct.iter_unpack(view[offset:stop])]
 
 
 
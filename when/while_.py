@@ -3,7 +3,7 @@ import datetime
 # third party libraries
 pass
 # first party libraries
-from . import substitutions
+from . import binary
 
 
 __all__ = ('While', )
@@ -12,36 +12,100 @@ __all__ = ('While', )
 class While(object):
     """ An alternative to ```datetime.timedelta``` with intuitive attributes.
 
-        pass
+        A While is an exact integer number of microseconds; each unit is 
+        available as a (float) attribute.
+        
+        >>> awhile = While(days=200, microseconds=1)
+        >>> awhile.microseconds
+        17280000000001.0
+        >>> awhile.days
+        200.00000000001157
+        >>> (awhile + While(hours=12)).days
+        200.50000000001157
+        >>> While(minutes=1.5) == While(seconds=90)
+        True
+        >>> While.from_timedelta(While(hours=-1).timedelta).hours
+        -1.0
+        
     """
-    conversions = {} # to seconds
-    conversions['microseconds'] = 1e-6
-    conversions['milliseconds'] = 1e-3
-    conversions['seconds'] = 1
-    conversions['minutes'] = 60
-    conversions['hours'] = 3600
-    conversions['days'] = 24*conversions['hours']
-    conversions['weeks'] = 7*conversions['days']
-    
+    __slots__ = ('_microseconds', )
+
     def __init__(self, days=0, hours=0, minutes=0, seconds=0, milliseconds=0, 
                  microseconds=0):
-        self._seconds = days*self.conversions['days'] + \
-                        hours*self.conversions['hours'] + \
-                        minutes*self.conversions['minutes'] + \
-                        seconds*self.conversions['seconds'] + \
-                        milliseconds*self.conversions['milliseconds'] + \
-                        microseconds*self.conversions['microseconds']
+        microseconds = days*86400000000 + hours*3600000000 + \
+                       minutes*60000000 + seconds*1000000 + \
+                       milliseconds*1000 + microseconds
+        if not isinstance(microseconds, int):
+            microseconds = int(round(microseconds))
+        self._microseconds = microseconds
+
+    @classmethod
+    def _from_microseconds(cls, microseconds):
+        # construct directly from an integer, bypassing __init__
+        awhile = cls.__new__(cls)
+        awhile._microseconds = microseconds
+        return awhile
 
     @classmethod
     def from_timedelta(cls, timedelta):
-        return cls(seconds=timedelta.total_seconds())
+        return cls._from_microseconds(
+            (timedelta.days*86400 + timedelta.seconds)*1000000 + 
+            timedelta.microseconds
+        )
 
     @property
     def timedelta(self):
-        return datetime.timedelta(seconds=self.seconds)
+        return datetime.timedelta(microseconds=self._microseconds)
         
     def __repr__(self):
         return '{}(seconds={})'.format(self.__class__.__name__, self.seconds)
+
+    def __reduce__(self):
+        return (self.__class__.from_bytes, (self.to_bytes(), ))
+
+    # binary serialization
+
+    def to_bytes(self):
+        """ Encode the While as its int64 microseconds, in eight bytes.
+            
+            >>> While.from_bytes(While(days=1).to_bytes()).hours
+            24.0
+            >>> While.loads_many(While.dumps_many([While(seconds=1), While()]))
+            [While(seconds=1.0), While(seconds=0.0)]
+            
+        """
+        return binary.while_struct.pack(self._microseconds)
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls._from_microseconds(binary.while_struct.unpack(data)[0])
+
+    @classmethod
+    def dumps_many(cls, whiles, buffer=None, offset=0):
+        """ Pack many Whiles back to back into ```buffer``` (allocated if not
+            supplied), starting at byte ```offset```, and return the buffer.
+        
+        """
+        struct = binary.while_struct
+        if buffer is None:
+            if not hasattr(whiles, '__len__'):
+                whiles = list(whiles)
+            buffer = bytearray(offset + struct.size*len(whiles))
+        pack_into = struct.pack_into
+        size = struct.size
+        for awhile in whiles:
+            pack_into(buffer, offset, awhile._microseconds)
+            offset += size
+        return buffer
+
+    @classmethod
+    def loads_many(cls, buffer, offset=0, count=None):
+        size = binary.while_struct.size
+        view = memoryview(buffer)
+        stop = len(view) if count is None else offset + size*count
+        from_microseconds = cls._from_microseconds
+        return [from_microseconds(microseconds) for microseconds, in 
+                binary.while_struct.iter_unpack(view[offset:stop])]
     
     """
     def __format__(self, specifier):
@@ -78,17 +142,76 @@ class While(object):
             return description
     """
     
-    def __getattr__(self, name):
-        try:
-            return self._seconds/float(self.conversions[name])
-        except KeyError:
-            raise AttributeError('Attribute {} does not exist.'.format(name))
+    # units
+
+    @property
+    def microseconds(self):
+        return float(self._microseconds)
+
+    @property
+    def milliseconds(self):
+        return self._microseconds/1e3
+
+    @property
+    def seconds(self):
+        return self._microseconds/1e6
+
+    @property
+    def minutes(self):
+        return self._microseconds/6e7
+
+    @property
+    def hours(self):
+        return self._microseconds/3.6e9
+
+    @property
+    def days(self):
+        return self._microseconds/8.64e10
+
+    @property
+    def weeks(self):
+        return self._microseconds/6.048e11
+
+    # comparison
+
+    def __eq__(self, other):
+        if isinstance(other, While):
+            return self._microseconds == other._microseconds
+        return NotImplemented
+
+    def __lt__(self, other):
+        if isinstance(other, While):
+            return self._microseconds < other._microseconds
+        return NotImplemented
+
+    def __le__(self, other):
+        if isinstance(other, While):
+            return self._microseconds <= other._microseconds
+        return NotImplemented
+
+    def __gt__(self, other):
+        if isinstance(other, While):
+            return self._microseconds > other._microseconds
+        return NotImplemented
+
+    def __ge__(self, other):
+        if isinstance(other, While):
+            return self._microseconds >= other._microseconds
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self._microseconds)
+
+    # arithmetic
     
     def __add__(self, other):
         if isinstance(other, While):
-            return self.__class__(seconds=(self.seconds + other.seconds))
+            return self._from_microseconds(self._microseconds + other._microseconds)
         elif isinstance(other, datetime.timedelta):
-            return self.__class__(seconds=(self.seconds + other.total_seconds()))
+            return self._from_microseconds(
+                self._microseconds + (other.days*86400 + other.seconds)*1000000 + 
+                other.microseconds
+            )
         else:
             return NotImplemented
 
@@ -100,25 +223,52 @@ class While(object):
 
     def __sub__(self, other):
         if isinstance(other, While):
-            return self.__class__(seconds=(self.seconds - other.seconds))
+            return self._from_microseconds(self._microseconds - other._microseconds)
         elif isinstance(other, datetime.timedelta):
-            return self.__class__(seconds=(self.seconds - other.total_seconds()))
+            return self._from_microseconds(
+                self._microseconds - (other.days*86400 + other.seconds)*1000000 - 
+                other.microseconds
+            )
         else:
             return NotImplemented
             
     def __mul__(self, other):
-        if isinstance(other, (int, float)):
-            cls = self.__class__
-            return cls(seconds=self.seconds*other)
+        if isinstance(other, int):
+            return self._from_microseconds(self._microseconds*other)
+        elif isinstance(other, float):
+            return self._from_microseconds(int(round(self._microseconds*other)))
         else:
             return NotImplemented
 
+    __rmul__ = __mul__
+
     def __div__(self, other):
-        if isinstance(other, (int, float)):
-            cls = self.__class__
-            return cls(seconds=self.seconds/other)
+        """ Divide by a number, rounding to the nearest microsecond (halves to 
+            even).  Integer divisors are divided exactly.
+            
+            >>> While(microseconds=2**60 + 1)/1 == While(microseconds=2**60 + 1)
+            True
+            >>> While(microseconds=5)/2, While(microseconds=7)/2
+            (While(seconds=2e-06), While(seconds=4e-06))
+            
+        """
+        if isinstance(other, int):
+            microseconds = self._microseconds
+            if other < 0:
+                microseconds, other = -microseconds, -other
+            quotient, remainder = divmod(microseconds, other)
+            if 2*remainder > other or (2*remainder == other and quotient & 1):
+                quotient += 1
+            return self._from_microseconds(quotient)
+        elif isinstance(other, float):
+            return self._from_microseconds(int(round(self._microseconds/other)))
         else:
             return NotImplemented
 
+    __truediv__ = __div__
+
+    def __neg__(self):
+        return self._from_microseconds(-self._microseconds)
+
     def __abs__(self):
-        return self.__class__(seconds=abs(self.seconds))
+        return self._from_microseconds(abs(self._microseconds))